@@ -7,3 +7,8 @@ class ApiConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Подключает обработчики сигналов инвалидации кэшей и индексов."""
+        from . import (  # noqa: F401
+            authentication, cache, counts, feed, pantry, search)
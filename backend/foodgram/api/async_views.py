@@ -0,0 +1,213 @@
+"""Асинхронные представления публичного API для чтения.
+
+Под ASGI (foodgram.asgi, foodgram.urls_async) GET-запросы к ленте
+и деталям рецептов, тегам, ингредиентам и коротким ссылкам обслуживают
+эти представления: запросы к БД выполняются через асинхронный ORM,
+и медленный запрос не занимает воркер целиком. Фильтры django-filter
+и пагинаторы синхронные, поэтому они, как и сам асинхронный ORM,
+выполняются через sync_to_async. Запись идёт через обычные вьюсеты.
+Ответы совпадают с ответами синхронных вьюсетов, включая кэш ленты
+для анонимов.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from foodgram.constants import (
+    MAX_RECIPELINKS_SHORTLINK_LENGHT, RECIPE_CACHE_TIMEOUT)
+from foodgram.routers import use_primary
+from recipes.models import Ingredient, Recipe, Tag
+from .cache import (
+    CACHE_HITS_KEY,
+    CACHE_MISSES_KEY,
+    RECIPE_GENERATION_KEY,
+    RECIPES_GENERATION_KEY,
+    get_cache_key,
+    increment)
+from .filters import RecipeFilter
+from .links import decode_short_link, legacy_links
+from .paginations import RecipePagination
+from .search import ingredient_index
+from .serializers import (
+    IngredientSerializer, ReadRecipeSerializer, TagSerializer)
+from .views import get_recipe_queryset
+
+ASYNC_METHODS = ('GET', 'HEAD')
+
+
+def render(data, status=200, headers=None):
+    """Отрисовывает данные первым рендерером из настроек DRF."""
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(
+        renderer.render(data),
+        content_type=renderer.media_type,
+        status=status,
+        headers=headers)
+
+
+def not_found(model):
+    """Http404 с тем же текстом, что у get_object_or_404."""
+    return Http404(
+        f'No {model._meta.object_name} matches the given query.')
+
+
+def async_read_view(view):
+    """Оборачивает асинхронное представление для чтения.
+
+    Аутентифицирует запрос классами DEFAULT_AUTHENTICATION_CLASSES
+    и превращает исключения DRF и Http404 в ответы, как APIView.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request, authenticators=[
+            authentication() for authentication
+            in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            if request.method not in ASYNC_METHODS:
+                raise exceptions.MethodNotAllowed(request.method)
+            await sync_to_async(getattr)(request, 'user')
+            return await view(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            response = exception_handler(exc, {'request': request})
+            headers = {
+                name: value for name, value in response.items()
+                if name.lower() != 'content-type'}
+            if isinstance(exc, (exceptions.NotAuthenticated,
+                                exceptions.AuthenticationFailed)):
+                headers['WWW-Authenticate'] = (
+                    request.authenticators[0].authenticate_header(request))
+            return render(response.data, response.status_code, headers)
+    return wrapper
+
+
+def read_or_write(read_view, write_view):
+    """Отдаёт чтение асинхронному представлению, остальное — синхронному.
+
+    OPTIONS тоже идёт в синхронный вьюсет: его метаданные описывает
+    APIView.options.
+    """
+    write_view = sync_to_async(write_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ASYNC_METHODS:
+            return await read_view(request, *args, **kwargs)
+        return await write_view(request, *args, **kwargs)
+    view.csrf_exempt = True
+    return view
+
+
+async def get_cached_response(request, cache_key, handler):
+    """Отдаёт ответ для анонима из кэша или кэширует ответ обработчика."""
+    if not request.user.is_anonymous:
+        return render(await handler())
+    data = await cache.aget(cache_key)
+    if data is not None:
+        await sync_to_async(increment)(CACHE_HITS_KEY)
+        return render(data, headers={'X-Cache': 'HIT'})
+    await sync_to_async(increment)(CACHE_MISSES_KEY)
+    with use_primary():
+        data = await handler()
+    await cache.aset(cache_key, data, RECIPE_CACHE_TIMEOUT)
+    return render(data, headers={'X-Cache': 'MISS'})
+
+
+@async_read_view
+async def recipe_list(request):
+    """Лента рецептов с фильтрами и пагинацией RecipeViewSet."""
+    async def handler():
+        filterset = RecipeFilter(
+            request.query_params,
+            queryset=get_recipe_queryset(Recipe.objects.all(), request.user),
+            request=request)
+        paginator = RecipePagination()
+
+        def paginate():
+            if not filterset.is_valid():
+                raise exceptions.ValidationError(filterset.errors)
+            return paginator.paginate_queryset(filterset.qs, request)
+        page = await sync_to_async(paginate)()
+        serializer = ReadRecipeSerializer(
+            page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data).data
+    return await get_cached_response(
+        request,
+        get_cache_key(request, RECIPES_GENERATION_KEY, 'list'),
+        handler)
+
+
+@async_read_view
+async def recipe_detail(request, pk):
+    """Рецепт по id."""
+    async def handler():
+        recipe = await get_recipe_queryset(
+            Recipe.objects.filter(pk=pk), request.user).afirst()
+        if recipe is None:
+            raise not_found(Recipe)
+        return ReadRecipeSerializer(
+            recipe, context={'request': request}).data
+    return await get_cached_response(
+        request,
+        get_cache_key(
+            request, RECIPE_GENERATION_KEY.format(pk=pk), 'detail', pk),
+        handler)
+
+
+@async_read_view
+async def tag_list(request):
+    """Список тегов."""
+    return render(TagSerializer(
+        [tag async for tag in Tag.objects.all()], many=True).data)
+
+
+@async_read_view
+async def tag_detail(request, pk):
+    """Тег по id."""
+    try:
+        return render(TagSerializer(await Tag.objects.aget(pk=pk)).data)
+    except Tag.DoesNotExist:
+        raise not_found(Tag)
+
+
+@async_read_view
+async def ingredient_list(request):
+    """Список ингредиентов или поиск по индексу в памяти."""
+    name = request.query_params.get('name')
+    if name:
+        return render(await sync_to_async(ingredient_index.search)(name))
+    return render(IngredientSerializer(
+        [ingredient async for ingredient in Ingredient.objects.all()],
+        many=True).data)
+
+
+@async_read_view
+async def ingredient_detail(request, pk):
+    """Ингредиент по id."""
+    try:
+        return render(IngredientSerializer(
+            await Ingredient.objects.aget(pk=pk)).data)
+    except Ingredient.DoesNotExist:
+        raise not_found(Ingredient)
+
+
+async def redirect_short_link(request, short_link):
+    """Раскодирует короткую ссылку в id рецепта и редиректит на полную.
+
+    Новые коды раскодируются без таблицы ссылок, старые — по словарю
+    в памяти, который при первом обращении загружается из БД. Затем
+    проверяется, что рецепт существует.
+    """
+    if len(short_link) == MAX_RECIPELINKS_SHORTLINK_LENGHT:
+        recipe_id = await sync_to_async(legacy_links.get)(short_link)
+    else:
+        recipe_id = decode_short_link(short_link)
+    if (recipe_id is None
+            or not await Recipe.objects.filter(pk=recipe_id).aexists()):
+        raise Http404('Ссылка не найдена.')
+    return redirect(request.build_absolute_uri(f'/recipes/{recipe_id}/'))
@@ -0,0 +1,151 @@
+"""Аутентификация по токену с кэшированием пользователя.
+
+TokenAuthentication на каждый запрос выбирает токен вместе
+с пользователем из БД. Здесь результат хранится в двух уровнях:
+в словаре процесса на AUTH_TOKEN_LOCAL_TIMEOUT секунд и в общем кэше
+на AUTH_TOKEN_CACHE_TIMEOUT. Записи удаляются при удалении токена
+(выход из системы) и при сохранении пользователя (смена пароля,
+аватара, деактивация). В других процессах запись из словаря
+может прожить ещё до AUTH_TOKEN_LOCAL_TIMEOUT секунд.
+В кэш попадают поля токена и пользователя без хэша пароля: пароль
+читается из БД при первом обращении к нему (смена пароля).
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.constants import (
+    AUTH_TOKEN_CACHE_TIMEOUT,
+    AUTH_TOKEN_LOCAL_MAX_SIZE,
+    AUTH_TOKEN_LOCAL_TIMEOUT)
+from foodgram.routers import use_primary
+from users.models import User
+
+AUTH_TOKEN_CACHE_KEY = 'auth:token:v2:{digest}'
+USER_CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname != 'password')
+
+
+def get_digest(key):
+    """Возвращает хэш токена: сам токен в ключи кэша не попадает."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def dump_token(token):
+    """Возвращает поля токена и пользователя для кэша без пароля."""
+    return (
+        token.key, token.created,
+        tuple(getattr(token.user, name) for name in USER_CACHED_FIELDS))
+
+
+def load_token(entry):
+    """Собирает токен и пользователя из кэша без запроса к БД.
+
+    Пароль пользователя остаётся отложенным полем: save() не
+    перезапишет его, а обращение к нему загрузит хэш из default.
+    """
+    key, created, values = entry
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_CACHED_FIELDS, values)
+    token = Token.from_db(
+        DEFAULT_DB_ALIAS, ('key', 'user_id', 'created'),
+        (key, user.pk, created))
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """Двухуровневый кэш токенов: словарь процесса и общий кэш."""
+
+    def __init__(self):
+        """Создаёт пустой словарь процесса."""
+        self._local = {}
+
+    def get(self, key):
+        """Возвращает новый токен с пользователем или None."""
+        digest = get_digest(key)
+        local = self._local.get(digest)
+        if local is not None and local[0] > time.monotonic():
+            return load_token(local[1])
+        entry = cache.get(AUTH_TOKEN_CACHE_KEY.format(digest=digest))
+        if entry is None:
+            return None
+        self.set_local(digest, entry)
+        return load_token(entry)
+
+    def set(self, token):
+        """Сохраняет токен с пользователем в оба уровня."""
+        digest = get_digest(token.key)
+        entry = dump_token(token)
+        cache.set(AUTH_TOKEN_CACHE_KEY.format(digest=digest), entry,
+                  AUTH_TOKEN_CACHE_TIMEOUT)
+        self.set_local(digest, entry)
+
+    def set_local(self, digest, entry):
+        """Сохраняет поля токена в словарь процесса."""
+        if len(self._local) >= AUTH_TOKEN_LOCAL_MAX_SIZE:
+            self._local.clear()
+        self._local[digest] = (
+            time.monotonic() + AUTH_TOKEN_LOCAL_TIMEOUT, entry)
+
+    def delete(self, keys):
+        """Удаляет токены из обоих уровней."""
+        digests = [get_digest(key) for key in keys]
+        for digest in digests:
+            self._local.pop(digest, None)
+        cache.delete_many([
+            AUTH_TOKEN_CACHE_KEY.format(digest=digest)
+            for digest in digests])
+
+    def clear_local(self):
+        """Очищает словарь процесса."""
+        self._local.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, берущий токен и пользователя из кэша."""
+
+    def authenticate_credentials(self, key):
+        """Возвращает пользователя и токен из кэша или из БД."""
+        token = token_cache.get(key)
+        if token is None:
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+            return user, token
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return token.user, token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Удаляет токен из кэша при выходе из системы."""
+    transaction.on_commit(partial(token_cache.delete, [instance.key]))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Удаляет токены пользователя из кэша после его изменения.
+
+    Обновление одного last_login при входе пропускается.
+    """
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    keys = list(Token.objects.filter(
+        user_id=instance.pk).values_list('key', flat=True))
+    if keys:
+        transaction.on_commit(partial(token_cache.delete, keys))
@@ -0,0 +1,203 @@
+"""Кэширование ответов эндпоинта recipes для анонимных пользователей.
+
+Ключи ответов содержат счётчики поколений: общий для списков рецептов
+и отдельный для каждого рецепта. При изменении рецепта счётчики
+увеличиваются, и старые ключи просто перестают запрашиваться,
+поэтому перебирать ключи в кэше не нужно. Ответы содержат поля автора
+ингредиентов и тегов, поэтому их изменение тоже сбрасывает кэш
+рецептов.
+"""
+import hashlib
+import time
+from functools import partial
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete)
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram.constants import RECIPE_CACHE_TIMEOUT
+from foodgram.routers import use_primary
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+RECIPES_GENERATION_KEY = 'recipes:generation'
+RECIPE_GENERATION_KEY = 'recipes:{pk}:generation'
+CACHE_HITS_KEY = 'recipes:cache:hits'
+CACHE_MISSES_KEY = 'recipes:cache:misses'
+
+
+def get_generation(key):
+    """Возвращает текущее поколение, создавая счётчик при отсутствии.
+
+    Начальное значение берётся из времени, чтобы счётчик, вытесненный
+    из кэша, не совпал с одним из прежних поколений.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def increment(key):
+    """Увеличивает счётчик в кэше на единицу и возвращает его."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def bump_generation(key):
+    """Переводит счётчик поколений на следующее значение."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_generation(key)
+
+
+def invalidate_recipes(pks=()):
+    """Инвалидирует списки рецептов и детали указанных рецептов."""
+    bump_generation(RECIPES_GENERATION_KEY)
+    for pk in pks:
+        bump_generation(RECIPE_GENERATION_KEY.format(pk=pk))
+
+
+def get_cache_stats():
+    """Возвращает число попаданий и промахов кэша рецептов."""
+    stats = cache.get_many([CACHE_HITS_KEY, CACHE_MISSES_KEY])
+    return {
+        'hits': stats.get(CACHE_HITS_KEY, 0),
+        'misses': stats.get(CACHE_MISSES_KEY, 0),
+    }
+
+
+def get_cache_key(request, generation_key, *parts):
+    """Собирает ключ ответа из поколения и нормализованного запроса.
+
+    Параметры сортируются, чтобы ?tags=a&tags=b и ?tags=b&tags=a
+    попадали в один ключ. Хост входит в ключ, так как ответ содержит
+    абсолютные ссылки на картинки.
+    """
+    query = urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values))
+    signature = hashlib.md5(
+        f'{request.build_absolute_uri("/")}?{query}'.encode()
+    ).hexdigest()
+    return ':'.join(map(str, (
+        'recipes', *parts, get_generation(generation_key), signature)))
+
+
+class AnonymousCacheMixin:
+    """Кэширует list и retrieve вьюсета для анонимных пользователей."""
+
+    def get_cached_response(self, request, cache_key, handler,
+                            *args, **kwargs):
+        """Отдаёт ответ из кэша или кэширует ответ обработчика."""
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        data = cache.get(cache_key)
+        if data is not None:
+            increment(CACHE_HITS_KEY)
+            return Response(data, headers={'X-Cache': 'HIT'})
+        increment(CACHE_MISSES_KEY)
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, RECIPE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов с кэшированием для анонимов."""
+        cache_key = get_cache_key(request, RECIPES_GENERATION_KEY, 'list')
+        return self.get_cached_response(
+            request, cache_key, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с кэшированием для анонимов."""
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        cache_key = get_cache_key(
+            request, RECIPE_GENERATION_KEY.format(pk=pk), 'detail', pk)
+        return self.get_cached_response(
+            request, cache_key, super().retrieve, *args, **kwargs)
+
+
+def invalidate_on_commit(pks):
+    """Откладывает инвалидацию до фиксации транзакции.
+
+    Иначе параллельный запрос может успеть закэшировать
+    ещё не зафиксированное состояние под новым поколением.
+    """
+    transaction.on_commit(partial(invalidate_recipes, pks))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Инвалидирует кэш при изменении или удалении рецепта."""
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def ingredient_in_recipe_changed(sender, instance, **kwargs):
+    """Инвалидирует кэш при изменении ингредиентов рецепта."""
+    invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None,
+                   **kwargs):
+    """Инвалидирует кэш рецептов автора при изменении его профиля."""
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    invalidate_on_commit(list(Recipe.objects.filter(
+        author=instance).values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    """Инвалидирует кэш рецептов с изменённым ингредиентом."""
+    if created:
+        return
+    invalidate_on_commit(list(IngredientInRecipe.objects.filter(
+        ingredient=instance).values_list('recipe_id', flat=True)))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    """Инвалидирует кэш рецептов с изменённым или удаляемым тегом.
+
+    При удалении рецепты выбираются до него: связи с тегом Django
+    удаляет без сигнала m2m_changed.
+    """
+    if created:
+        return
+    invalidate_on_commit(list(Recipe.tags.through.objects.filter(
+        tag=instance).values_list('recipe_id', flat=True)))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Инвалидирует кэш при изменении тегов рецепта."""
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_on_commit(list(sender.objects.filter(
+            tag=instance).values_list('recipe_id', flat=True)))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_on_commit(pk_set)
@@ -0,0 +1,103 @@
+"""Кэшированные и приблизительные count для пагинации.
+
+Число объектов кэшируется по сигнатуре SQL запроса (то есть по набору
+фильтров) вместе с поколением модели. Поколение меняется при создании
+и удалении объектов, от которых зависят фильтры, а короткий таймаут
+ограничивает устаревание после массовых операций без сигналов.
+Для нефильтрованных больших таблиц PostgreSQL число берётся из оценки
+планировщика pg_class.reltuples и помечается как неточное.
+"""
+import hashlib
+from functools import partial
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.constants import APPROXIMATE_COUNT_THRESHOLD, COUNT_CACHE_TIMEOUT
+from foodgram.routers import use_primary
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+from .cache import bump_generation, get_generation
+
+COUNT_GENERATION_KEY = 'counts:{label}:generation'
+COUNT_DEPENDENCIES = {
+    Recipe: (Recipe, Recipe.tags.through, Favorite, ShoppingCart),
+    User: (User, Subscribe),
+}
+
+
+def get_estimate(queryset):
+    """Возвращает оценку числа строк таблицы из pg_class или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+
+def get_count(queryset):
+    """Возвращает число объектов кверисета и признак точности.
+
+    Оценка используется только без фильтров и DISTINCT и только
+    если она не меньше APPROXIMATE_COUNT_THRESHOLD.
+    """
+    query = queryset.query
+    if not query.where and not query.distinct:
+        estimate = get_estimate(queryset)
+        if estimate is not None and estimate >= APPROXIMATE_COUNT_THRESHOLD:
+            return estimate, False
+    try:
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return 0, True
+    signature = hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+    cache_key = ':'.join(map(str, (
+        'counts', queryset.model._meta.label_lower,
+        get_generation(COUNT_GENERATION_KEY.format(
+            label=queryset.model._meta.label_lower)),
+        signature)))
+    count = cache.get(cache_key)
+    if count is None:
+        with use_primary():
+            count = queryset.count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return count, True
+
+
+def invalidate_counts(model):
+    """Сбрасывает кэш count моделей, зависящих от model."""
+    for counted, dependencies in COUNT_DEPENDENCIES.items():
+        if model in dependencies:
+            bump_generation(COUNT_GENERATION_KEY.format(
+                label=counted._meta.label_lower))
+
+
+def object_saved(sender, created, **kwargs):
+    """Сбрасывает кэш count после создания объекта."""
+    if created:
+        transaction.on_commit(partial(invalidate_counts, sender))
+
+
+def object_deleted(sender, **kwargs):
+    """Сбрасывает кэш count после удаления объекта."""
+    transaction.on_commit(partial(invalidate_counts, sender))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    """Сбрасывает кэш count после изменения тегов рецептов."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(partial(invalidate_counts, sender))
+
+
+for dependency in {model for dependencies in COUNT_DEPENDENCIES.values()
+                   for model in dependencies}:
+    post_save.connect(object_saved, sender=dependency)
+    post_delete.connect(object_deleted, sender=dependency)
@@ -0,0 +1,130 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Рецепт при публикации раскладывается в Timeline каждого подписчика
+автора (fan-out на запись) пачками bulk_create, и лента читается
+по индексу (user, -pub_date, -recipe) без соединения с подписками.
+Рецепт автора, у которого при публикации не меньше
+FEED_FANOUT_MAX_FOLLOWERS подписчиков, не раскладывается и отмечается
+feed_pulled: такие рецепты выбираются при чтении ленты (fan-out
+на чтение) и сливаются с Timeline по ключу сортировки. Способ
+выбирается для рецепта один раз, поэтому рецепты не пропадают из лент,
+когда число подписчиков автора переходит порог в любую сторону.
+Лента каждого пользователя обрезается до FEED_TIMELINE_LENGTH записей.
+"""
+from collections import defaultdict
+from functools import partial
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from foodgram.constants import (
+    FEED_BACKFILL_BATCH_SIZE,
+    FEED_FANOUT_BATCH_SIZE,
+    FEED_FANOUT_MAX_FOLLOWERS,
+    FEED_TIMELINE_LENGTH)
+from recipes.models import Recipe, Timeline
+from users.models import Subscribe, User
+
+TIMELINE_ORDERING = ('-pub_date', '-recipe')
+
+
+def batched(rows, size):
+    """Разбивает поток строк на списки по size элементов."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def get_feed_sources(user):
+    """Возвращает источники ленты: пары (кверисет, ordering).
+
+    Ключи сортировки источников — дата публикации и id рецепта.
+    """
+    authors = Subscribe.objects.filter(user=user).values('author')
+    return [
+        (Timeline.objects.filter(user=user), TIMELINE_ORDERING),
+        (Recipe.objects.filter(feed_pulled=True, author__in=authors),
+         Recipe._meta.ordering),
+    ]
+
+
+def trim_timelines(user_ids):
+    """Оставляет в лентах пользователей FEED_TIMELINE_LENGTH записей."""
+    overflow = Timeline.objects.filter(user_id__in=user_ids).annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F('user'),
+            order_by=(F('pub_date').desc(), F('recipe').desc()))
+    ).filter(row_number__gt=FEED_TIMELINE_LENGTH)
+    Timeline.objects.filter(pk__in=overflow.values('pk')).delete()
+
+
+def fan_out(recipe_id, author_id, pub_date):
+    """Добавляет рецепт в ленты подписчиков автора."""
+    followers = Subscribe.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True).iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+    for batch in batched(followers, FEED_FANOUT_BATCH_SIZE):
+        Timeline.objects.bulk_create(
+            (Timeline(user_id=user_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+             for user_id in batch),
+            ignore_conflicts=True)
+        trim_timelines(batch)
+
+
+def backfill(subscriptions):
+    """Добавляет в ленты последние рецепты авторов из подписок.
+
+    subscriptions — пары (id подписчика, id автора). Для каждого
+    автора берутся FEED_TIMELINE_LENGTH последних рецептов без
+    feed_pulled одним запросом с ROW_NUMBER() OVER (PARTITION BY author).
+    """
+    for batch in batched(subscriptions, FEED_BACKFILL_BATCH_SIZE):
+        latest = Recipe.objects.filter(
+            author_id__in={author_id for _, author_id in batch},
+            feed_pulled=False
+        ).annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('pub_date').desc(), F('id').desc()))
+        ).filter(row_number__lte=FEED_TIMELINE_LENGTH)
+        recipes = defaultdict(list)
+        for author_id, recipe_id, pub_date in latest.values_list(
+                'author_id', 'id', 'pub_date'):
+            recipes[author_id].append((recipe_id, pub_date))
+        Timeline.objects.bulk_create(
+            (Timeline(user_id=user_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+             for user_id, author_id in batch
+             for recipe_id, pub_date in recipes[author_id]),
+            batch_size=FEED_FANOUT_BATCH_SIZE,
+            ignore_conflicts=True)
+        trim_timelines({user_id for user_id, _ in batch})
+
+
+def unfollow(user_id, author_id):
+    """Убирает рецепты автора из ленты бывшего подписчика."""
+    Timeline.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+@receiver(pre_save, sender=Recipe)
+def choose_distribution(sender, instance, **kwargs):
+    """Отмечает новый рецепт популярного автора как читаемый при запросе."""
+    if instance._state.adding:
+        instance.feed_pulled = User.objects.filter(
+            pk=instance.author_id,
+            followers_count__gte=FEED_FANOUT_MAX_FOLLOWERS).exists()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Раскладывает новый рецепт по лентам после фиксации транзакции."""
+    if created and not instance.feed_pulled:
+        transaction.on_commit(partial(
+            fan_out, instance.pk, instance.author_id, instance.pub_date))
@@ -2,8 +2,9 @@
 from django_filters import rest_framework
 from typing import Any
 
-from foodgram.constants import RECIPE_STATUS_CHOICES
+from foodgram.constants import RECIPE_STATUS_CHOICES, SEARCH_MODE_CHOICES
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 from users.models import User
 
 
@@ -39,6 +40,13 @@ class RecipeFilter(rest_framework.FilterSet):
         choices=RECIPE_STATUS_CHOICES,
         method='get_is_favorited'
     )
+    search = rest_framework.CharFilter(
+        method='get_search'
+    )
+    search_mode = rest_framework.ChoiceFilter(
+        choices=SEARCH_MODE_CHOICES,
+        method='get_search_mode'
+    )
 
     def get_is_in_shopping_cart(
             self, queryset: Any, name: str, value: str) -> Any:
@@ -58,8 +66,18 @@ class RecipeFilter(rest_framework.FilterSet):
                 queryset = queryset.filter(favorite__user=user)
         return queryset
 
+    def get_search(self, queryset: Any, name: str, value: str) -> Any:
+        """Поиск по названию и описанию с сортировкой по релевантности."""
+        return search_recipes(
+            queryset, value, self.form.cleaned_data.get('search_mode'))
+
+    def get_search_mode(self, queryset: Any, name: str, value: str) -> Any:
+        """Режим поиска применяется в get_search."""
+        return queryset
+
     class Meta:
         """RecipeFilter метакласс."""
 
         model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
+        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited',
+                  'search', 'search_mode']
@@ -0,0 +1,137 @@
+"""Короткие ссылки на рецепты без таблицы ссылок.
+
+Код ссылки — id рецепта, перемешанный ключевой перестановкой
+(сеть Фейстеля с ключом SHORT_LINK_SECRET) и записанный в base62,
+поэтому /s/<код> обратимо превращается в id без поиска кода в БД,
+а соседние рецепты получают непохожие коды. Новые коды не короче
+SHORT_LINK_LENGTH символов, а старые случайные коды RecipeLinks имеют
+длину MAX_RECIPELINKS_SHORTLINK_LENGHT и разрешаются через словарь
+в памяти, загружаемый один раз на процесс.
+"""
+import hashlib
+import string
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from foodgram.constants import (
+    MAX_RECIPELINKS_SHORTLINK_LENGHT, SHORT_LINK_LENGTH)
+from foodgram.routers import use_primary
+from recipes.models import RecipeLinks
+
+ALPHABET = string.digits + string.ascii_letters
+SHORT_LINK_SPACE = len(ALPHABET) ** SHORT_LINK_LENGTH
+FEISTEL_HALF_BITS = ((SHORT_LINK_SPACE - 1).bit_length() + 1) // 2
+FEISTEL_HALF_MASK = (1 << FEISTEL_HALF_BITS) - 1
+FEISTEL_ROUNDS = 4
+
+
+def to_base62(number):
+    """Записывает неотрицательное число в base62."""
+    digits = ''
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        digits = ALPHABET[digit] + digits
+        if not number:
+            return digits
+
+
+def from_base62(digits):
+    """Читает число из base62."""
+    number = 0
+    for digit in digits:
+        number = number * len(ALPHABET) + ALPHABET.index(digit)
+    return number
+
+
+@lru_cache(maxsize=1)
+def keyed_hash(secret):
+    """Хэш blake2b с ключом из секрета, вычисляемый один раз."""
+    return hashlib.blake2b(
+        key=hashlib.sha256(secret.encode()).digest(), digest_size=8)
+
+
+def round_function(round_number, half):
+    """Раунд сети Фейстеля: ключевой хэш половины блока."""
+    state = keyed_hash(settings.SHORT_LINK_SECRET).copy()
+    state.update(f'{round_number}:{half}'.encode())
+    return int.from_bytes(state.digest(), 'big') & FEISTEL_HALF_MASK
+
+
+def feistel(number, inverse=False):
+    """Переставляет число в пределах 2 ** (2 * FEISTEL_HALF_BITS)."""
+    left, right = number >> FEISTEL_HALF_BITS, number & FEISTEL_HALF_MASK
+    if inverse:
+        for round_number in reversed(range(FEISTEL_ROUNDS)):
+            left, right = right ^ round_function(round_number, left), left
+    else:
+        for round_number in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ round_function(round_number, right)
+    return (left << FEISTEL_HALF_BITS) | right
+
+
+def permute(number, inverse=False):
+    """Переставляет число в пределах SHORT_LINK_SPACE.
+
+    Результаты за пределами диапазона переставляются повторно,
+    пока не попадут в него, поэтому перестановка остаётся взаимно
+    однозначной.
+    """
+    number = feistel(number, inverse)
+    while number >= SHORT_LINK_SPACE:
+        number = feistel(number, inverse)
+    return number
+
+
+def encode_recipe_id(recipe_id):
+    """Возвращает код короткой ссылки рецепта."""
+    block, offset = divmod(recipe_id, SHORT_LINK_SPACE)
+    return to_base62(
+        block * SHORT_LINK_SPACE + permute(offset)
+    ).rjust(SHORT_LINK_LENGTH, ALPHABET[0])
+
+
+def decode_short_link(short_link):
+    """Возвращает id рецепта по коду или None для чужих кодов."""
+    if (len(short_link) < SHORT_LINK_LENGTH
+            or not set(short_link) <= set(ALPHABET)):
+        return None
+    block, offset = divmod(from_base62(short_link), SHORT_LINK_SPACE)
+    recipe_id = block * SHORT_LINK_SPACE + permute(offset, inverse=True)
+    if encode_recipe_id(recipe_id) != short_link:
+        return None
+    return recipe_id
+
+
+class LegacyLinks:
+    """Старые случайные коды из RecipeLinks, загружаемые один раз."""
+
+    def __init__(self):
+        """Создаёт пустой словарь."""
+        self._lock = threading.Lock()
+        self._links = None
+
+    def get(self, short_link):
+        """Возвращает id рецепта по старому коду или None."""
+        if self._links is None:
+            with self._lock:
+                if self._links is None:
+                    with use_primary():
+                        self._links = dict(RecipeLinks.objects.values_list(
+                            'short_link', 'recipe_id'))
+        return self._links.get(short_link)
+
+    def clear(self):
+        """Сбрасывает словарь, он будет загружен заново."""
+        self._links = None
+
+
+legacy_links = LegacyLinks()
+
+
+def resolve_short_link(short_link):
+    """Возвращает id рецепта по новому или старому коду."""
+    if len(short_link) == MAX_RECIPELINKS_SHORTLINK_LENGHT:
+        return legacy_links.get(short_link)
+    return decode_short_link(short_link)
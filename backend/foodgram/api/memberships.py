@@ -0,0 +1,97 @@
+"""Избранное, корзина и подписки одним запросом к БД.
+
+Связь добавляется INSERT ... ON CONFLICT DO NOTHING RETURNING
+и удаляется DELETE ... RETURNING, без предварительной проверки
+exists(), поэтому параллельные одинаковые запросы не создают дублей:
+строку вставит только один из них. Ответ 400 или 404 выбирается
+по числу затронутых строк. Сигналы при этом не отправляются,
+поэтому счётчики и кэш count обновляются здесь же.
+"""
+from functools import partial
+
+from django.db import connections, router, transaction
+
+from recipes.models import Favorite, ShoppingCart, change_counter
+from users.models import Subscribe
+from .counts import invalidate_counts
+
+MEMBERSHIPS = {
+    Favorite: ('recipe', 'favorites_count'),
+    ShoppingCart: ('recipe', 'in_carts_count'),
+    Subscribe: ('author', 'followers_count'),
+}
+
+
+def get_tables(model):
+    """Возвращает поля связи и модель, на которую она ссылается."""
+    target_name, counter = MEMBERSHIPS[model]
+    target_field = model._meta.get_field(target_name)
+    return (model._meta.get_field('user'), target_field,
+            target_field.related_model, counter)
+
+
+def add_membership(model, user, target_id):
+    """Добавляет связь пользователя с рецептом или автором.
+
+    Возвращает объект, на который ссылается связь, с увеличенным
+    счётчиком или None, если связь уже была или объекта нет.
+    """
+    _, target_field, target, counter = get_tables(model)
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    instance = model(user=user)
+    columns, values, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(quote(field.column))
+        if field is target_field:
+            values.append(quote(target._meta.pk.column))
+        else:
+            values.append('%s')
+            params.append(field.get_db_prep_save(
+                field.pre_save(instance, add=True), connection))
+    fields = target._meta.concrete_fields
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({", ".join(columns)}) '
+            f'SELECT {", ".join(values)} '
+            f'FROM {quote(target._meta.db_table)} '
+            f'WHERE {quote(target._meta.pk.column)} = %s '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(target_field.column)}',
+            [*params, target_id])
+        if not cursor.fetchall():
+            return None
+        counter_column = quote(target._meta.get_field(counter).column)
+        cursor.execute(
+            f'UPDATE {quote(target._meta.db_table)} '
+            f'SET {counter_column} = {counter_column} + 1 '
+            f'WHERE {quote(target._meta.pk.column)} = %s '
+            f'RETURNING {", ".join(quote(field.column) for field in fields)}',
+            [target_id])
+        row = cursor.fetchone()
+    transaction.on_commit(partial(invalidate_counts, model), using=alias)
+    return target.from_db(alias, [field.attname for field in fields], row)
+
+
+def remove_membership(model, user, target_id):
+    """Удаляет связь и возвращает True, если она была."""
+    user_field, target_field, target, counter = get_tables(model)
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(user_field.column)} = %s '
+            f'AND {quote(target_field.column)} = %s '
+            f'RETURNING {quote(target_field.column)}',
+            [user.pk, target_id])
+        if not cursor.fetchall():
+            return False
+    change_counter(target, target_id, counter, -1)
+    transaction.on_commit(partial(invalidate_counts, model), using=alias)
+    return True
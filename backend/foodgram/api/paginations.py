@@ -1,11 +1,235 @@
 """Кастомные пагинаторы проекта Foodgram."""
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import heapq
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+    PageNumberPagination,
+    _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from foodgram.constants import MAX_RECIPE_PER_PAGE
+from recipes.models import Recipe
+from .counts import get_count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, берущий count из кэша или оценки планировщика."""
+
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        """Возвращает число объектов и запоминает его точность."""
+        count, self.count_is_exact = get_count(self.object_list)
+        return count
+
+
+class CachedCountPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с кэшированным count."""
+
+    django_paginator_class = CachedCountPaginator
+
+    def get_paginated_response(self, data):
+        """Добавляет в ответ признак точности count."""
+        response = super().get_paginated_response(data)
+        response.data['count_is_exact'] = self.page.paginator.count_is_exact
+        return response
+
 
+class CachedCountLimitOffsetPagination(LimitOffsetPagination):
+    """Пагинация limit/offset с кэшированным count."""
 
-class RecipePagination(PageNumberPagination):
-    """Пагинация для рецептов на главной странице."""
+    count_is_exact = True
 
+    def get_count(self, queryset):
+        """Возвращает число объектов и запоминает его точность."""
+        count, self.count_is_exact = get_count(queryset)
+        return count
+
+    def get_paginated_response(self, data):
+        """Добавляет в ответ признак точности count."""
+        response = super().get_paginated_response(data)
+        response.data['count_is_exact'] = self.count_is_exact
+        return response
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по ключу сортировки без COUNT и OFFSET.
+
+    Курсор хранит значения полей ordering последнего объекта страницы,
+    а следующая страница выбирается условием «строго после ключа»,
+    поэтому её стоимость не зависит от глубины и совпадает с первой.
+    Последнее поле ordering должно быть уникальным. Кверисет,
+    отсортированный по аннотации (релевантность поиска), курсором
+    не обходится: на ответ 400.
+    """
+
+    ordering = ('-pub_date', '-id')
+    cursor_query_param = 'cursor'
     page_size = MAX_RECIPE_PER_PAGE
     page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор.'
+    ranked_ordering_message = (
+        'Курсор нельзя использовать с сортировкой по релевантности.')
+
+    def get_page_size(self, request):
+        """Возвращает размер страницы из параметра limit."""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_fields(self, model, ordering=None):
+        """Возвращает пары (поле модели, по убыванию) из ordering."""
+        return [
+            (model._meta.get_field(name.lstrip('-')),
+             name.startswith('-'))
+            for name in ordering or self.ordering]
+
+    def encode_cursor(self, obj):
+        """Кодирует ключ сортировки объекта в строку курсора."""
+        position = [
+            field.value_to_string(obj)
+            for field, _ in self.get_fields(type(obj))]
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа из строки курсора."""
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value)
+                    for (field, _), value in zip(self.fields, position)]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, position):
+        """Строит условие «строго после ключа» для сортировки ordering.
+
+        Нестрогая граница по первому полю дублирует условие, но только
+        её планировщик может использовать как границу диапазона индекса.
+        """
+        condition, equal = Q(), {}
+        for (field, descending), value in zip(self.fields, position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field.name}__{lookup}': value})
+            equal[field.name] = value
+        (first, descending), value = self.fields[0], position[0]
+        lookup = 'lte' if descending else 'gte'
+        return Q(**{f'{first.name}__{lookup}': value}) & condition
+
+    def is_ranked(self, queryset):
+        """Проверяет, отсортирован ли кверисет по аннотации."""
+        return any(
+            isinstance(name, str)
+            and name.lstrip('-') in queryset.query.annotations
+            for name in queryset.query.order_by)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает страницу после курсора и запоминает следующий."""
+        if self.is_ranked(queryset):
+            raise ParseError(self.ranked_ordering_message)
+        self.request = request
+        self.fields = self.get_fields(queryset.model)
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.decode_cursor(cursor)))
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = (
+            self.encode_cursor(page[page_size - 1])
+            if len(page) > page_size else None)
+        return page[:page_size]
+
+    def get_next_link(self):
+        """Возвращает ссылку на следующую страницу."""
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(),
+            PageNumberPagination.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        """Возвращает страницу без общего числа объектов."""
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class FeedPagination(KeysetPagination):
+    """Курсорная пагинация ленты, слитой из нескольких источников.
+
+    Источники — пары (кверисет, ordering) с ключом сортировки
+    (дата публикации, id рецепта). Из каждого выбирается страница
+    после курсора, страницы сливаются heapq.merge, а повторы рецептов
+    из разных источников пропускаются.
+    """
+
+    def paginate_sources(self, sources, request):
+        """Возвращает id рецептов страницы и запоминает следующий курсор."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.fields = self.get_fields(Recipe)
+        position = self.decode_cursor(cursor) if cursor else None
+        pages = []
+        for queryset, ordering in sources:
+            self.fields = self.get_fields(queryset.model, ordering)
+            if position is not None:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+            pages.append(queryset.order_by(*ordering).values_list(
+                *(field.attname for field, _ in self.fields)
+            )[:page_size + 1])
+        keys = []
+        for key in heapq.merge(*pages, reverse=True):
+            if not keys or keys[-1] != key:
+                keys.append(key)
+            if len(keys) > page_size:
+                break
+        self.next_cursor = None
+        if len(keys) > page_size:
+            pub_date, pk = keys[page_size - 1]
+            self.next_cursor = self.encode_cursor(
+                Recipe(pub_date=pub_date, pk=pk))
+        return [pk for _, pk in keys[:page_size]]
+
+
+class RecipePagination(CachedCountPageNumberPagination):
+    """Пагинация для рецептов на главной странице.
+
+    По умолчанию постраничная, а при наличии параметра cursor
+    (пустого для первой страницы) переключается на KeysetPagination.
+    """
+
+    page_size = MAX_RECIPE_PER_PAGE
+    page_size_query_param = 'limit'
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Выбирает режим пагинации по параметрам запроса."""
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Возвращает ответ в формате выбранного режима."""
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
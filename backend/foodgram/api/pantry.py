@@ -0,0 +1,181 @@
+"""Подбор рецептов по имеющимся ингредиентам в памяти процесса.
+
+Индекс хранит для каждого ингредиента отсортированный массив id
+рецептов (array 'I', 4 байта на id), а для каждого рецепта — массив
+id его ингредиентов. Запрос складывает массивы выбранных ингредиентов
+в Counter (подсчёт идёт в C), так что стоимость запроса зависит
+от длины этих массивов, а не от размера каталога.
+
+Индекс строится из IngredientInRecipe при первом запросе. Изменённые
+рецепты записываются в журнал в общем кэше (номер изменения -> id
+рецепта), и каждый процесс перед запросом переиндексирует только их.
+Если журнал отстал больше чем на PANTRY_MAX_REPLAY записей или
+записи вытеснены из кэша, индекс строится заново.
+"""
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from functools import partial
+from operator import sub, truediv
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.constants import (
+    PANTRY_CHANGE_TIMEOUT,
+    PANTRY_CHUNK_SIZE,
+    PANTRY_MAX_REPLAY,
+    PANTRY_SEARCH_LIMIT)
+from foodgram.routers import use_primary
+from recipes.models import IngredientInRecipe, Recipe
+from .cache import bump_generation, get_generation, increment
+
+PANTRY_GENERATION_KEY = 'pantry:generation'
+PANTRY_SEQUENCE_KEY = 'pantry:sequence'
+PANTRY_CHANGE_KEY = 'pantry:change:{number}'
+
+
+def get_sequence():
+    """Возвращает номер последнего изменения в журнале."""
+    return cache.get(PANTRY_SEQUENCE_KEY) or 0
+
+
+class PantryIndex:
+    """Инвертированный индекс: ингредиент -> отсортированные id рецептов."""
+
+    def __init__(self):
+        """Создаёт пустой индекс."""
+        self._lock = threading.Lock()
+        self._generation = None
+        self._sequence = 0
+        self._postings = {}
+        self._recipes = {}
+
+    @use_primary()
+    def build(self, generation):
+        """Загружает связи рецептов с ингредиентами из БД.
+
+        Номер журнала читается до загрузки: изменения, попавшие
+        в журнал во время загрузки, будут применены повторно,
+        что безопасно.
+        """
+        sequence = get_sequence()
+        postings = defaultdict(partial(array, 'I'))
+        recipes = defaultdict(partial(array, 'I'))
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.order_by(
+                'ingredient_id', 'recipe_id').values_list(
+                    'recipe_id', 'ingredient_id').iterator(
+                        chunk_size=PANTRY_CHUNK_SIZE):
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self._postings = dict(postings)
+        self._recipes = dict(recipes)
+        self._generation = generation
+        self._sequence = sequence
+
+    @use_primary()
+    def reindex(self, recipe_ids):
+        """Перечитывает ингредиенты указанных рецептов из БД."""
+        ingredients = defaultdict(partial(array, 'I'))
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids).order_by(
+                    'ingredient_id').values_list(
+                        'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self._recipes.pop(recipe_id, ()):
+                postings = self._postings[ingredient_id]
+                position = bisect_left(postings, recipe_id)
+                if (position < len(postings)
+                        and postings[position] == recipe_id):
+                    del postings[position]
+            if recipe_id not in ingredients:
+                continue
+            self._recipes[recipe_id] = ingredients[recipe_id]
+            for ingredient_id in ingredients[recipe_id]:
+                insort(self._postings.setdefault(
+                    ingredient_id, array('I')), recipe_id)
+
+    def ensure_current(self):
+        """Применяет журнал изменений или перестраивает индекс."""
+        generation = get_generation(PANTRY_GENERATION_KEY)
+        if generation != self._generation:
+            self.build(generation)
+            return
+        sequence = get_sequence()
+        if sequence == self._sequence:
+            return
+        if not 0 < sequence - self._sequence <= PANTRY_MAX_REPLAY:
+            self.build(generation)
+            return
+        keys = [PANTRY_CHANGE_KEY.format(number=number)
+                for number in range(self._sequence + 1, sequence + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.build(generation)
+            return
+        self.reindex(set(changes.values()))
+        self._sequence = sequence
+
+    def search(self, ingredient_ids, limit=PANTRY_SEARCH_LIMIT):
+        """Возвращает лучшие рецепты для набора ингредиентов.
+
+        Результат — список (id рецепта, число имеющихся ингредиентов,
+        число недостающих). Рецепты сортируются по доле имеющихся
+        ингредиентов, затем по числу недостающих и по новизне.
+        Ключи сортировки собираются через map и zip без вызовов
+        функций Python на каждый рецепт.
+        """
+        with self._lock:
+            self.ensure_current()
+            matches = Counter()
+            for ingredient_id in set(ingredient_ids):
+                matches.update(self._postings.get(ingredient_id, ()))
+            sizes = list(map(len, map(
+                self._recipes.__getitem__, matches.keys())))
+            top = heapq.nlargest(limit, zip(
+                map(truediv, matches.values(), sizes),
+                map(sub, matches.values(), sizes),
+                matches.keys(),
+                matches.values()))
+            return [(recipe_id, matched, -shortage)
+                    for _, shortage, recipe_id, matched in top]
+
+
+pantry_index = PantryIndex()
+
+
+def invalidate_pantry():
+    """Помечает индекс устаревшим во всех процессах."""
+    bump_generation(PANTRY_GENERATION_KEY)
+
+
+def record_changes(recipe_ids):
+    """Записывает изменённые рецепты в журнал."""
+    for recipe_id in recipe_ids:
+        cache.set(
+            PANTRY_CHANGE_KEY.format(number=increment(PANTRY_SEQUENCE_KEY)),
+            recipe_id, PANTRY_CHANGE_TIMEOUT)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Переиндексирует рецепт после сохранения или удаления.
+
+    Ингредиенты при обновлении рецепта меняются через bulk_create
+    и bulk_update без сигналов, но рецепт сохраняется в той же
+    транзакции, а журнал пишется после её фиксации.
+    """
+    transaction.on_commit(partial(record_changes, [instance.pk]))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def ingredient_in_recipe_changed(sender, instance, **kwargs):
+    """Переиндексирует рецепт после изменения его ингредиентов."""
+    transaction.on_commit(partial(record_changes, [instance.recipe_id]))
@@ -0,0 +1,30 @@
+"""Парсер JSON на orjson.
+
+orjson, как и JSONParser при STRICT_JSON, не принимает NaN и Infinity.
+Без orjson и для тел не в UTF-8 используется JSONParser.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSONParser на orjson с откатом на стандартный json."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Разбирает тело запроса в JSON."""
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
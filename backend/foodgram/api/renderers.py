@@ -0,0 +1,49 @@
+"""Рендерер JSON на orjson.
+
+orjson сериализует ответы в несколько раз быстрее стандартного json.
+Дата и время, Decimal, ленивые строки перевода и прочие типы, которых
+orjson не знает, передаются в JSONEncoder DRF, поэтому ответ совпадает
+с ответом JSONRenderer. Без orjson, с отступами, UNICODE_JSON = False
+или COMPACT_JSON = False, а также на данных, которые orjson не может
+сериализовать (например, целые больше 64 бит), используется JSONRenderer.
+"""
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'))
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson с откатом на стандартный json."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Сериализует data в JSON в кодировке UTF-8."""
+        if (orjson is None or not self.compact or self.ensure_ascii
+                or self.get_indent(
+                    accepted_media_type, renderer_context or {})):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранирует разделители строк для JavaScript.
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
@@ -0,0 +1,87 @@
+"""Поиск ингредиентов по названию в памяти процесса.
+
+Справочник ингредиентов почти не меняется, поэтому вместо запроса
+name__istartswith к БД на каждое нажатие клавиши названия держатся
+в отсортированном списке, а префикс ищется бинарным поиском.
+"""
+import bisect
+import threading
+from itertools import islice
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.constants import INGREDIENT_SEARCH_LIMIT
+from foodgram.routers import use_primary
+from recipes.models import Ingredient
+from .cache import bump_generation, get_generation
+
+INGREDIENTS_GENERATION_KEY = 'ingredients:generation'
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в нижнем регистре.
+
+    Строится лениво при первом поиске и перестраивается, когда
+    меняется поколение ингредиентов в кэше. Поколение общее для всех
+    процессов, если кэш общий.
+    """
+
+    def __init__(self):
+        """Создаёт пустой индекс."""
+        self._lock = threading.Lock()
+        self._generation = None
+        self._index = ([], [])
+
+    @use_primary()
+    def build(self, generation):
+        """Загружает ингредиенты из БД и сортирует их по названию."""
+        ingredients = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'))
+        self._index = (
+            [key for key, *_ in ingredients],
+            [{'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+             for _, pk, name, measurement_unit in ingredients])
+        self._generation = generation
+
+    def ensure_built(self):
+        """Перестраивает индекс, если он устарел."""
+        generation = get_generation(INGREDIENTS_GENERATION_KEY)
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation != self._generation:
+                self.build(generation)
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        """Ищет ингредиенты: сначала по префиксу, затем по подстроке."""
+        self.ensure_built()
+        keys, rows = self._index
+        query = query.lower()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + chr(0x10FFFF), lo=start)
+        result = rows[start:min(end, start + limit)]
+        if len(result) < limit:
+            result += islice((
+                row for key, row in zip(keys, rows)
+                if query in key and not key.startswith(query)
+            ), limit - len(result))
+        return result
+
+
+ingredient_index = IngredientIndex()
+
+
+def invalidate_ingredients():
+    """Помечает индекс ингредиентов устаревшим во всех процессах."""
+    bump_generation(INGREDIENTS_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    """Перестраивает индекс после изменения ингредиента."""
+    transaction.on_commit(invalidate_ingredients)
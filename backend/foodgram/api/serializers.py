@@ -5,8 +5,10 @@ import re
 from django.core.files.base import ContentFile
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from foodgram.constants import (
     USERNAME_PATTERN,
@@ -16,7 +18,8 @@ from recipes.models import (
     IngredientInRecipe,
     Recipe,
     Tag)
-from users.models import Subscribe, User
+from users.models import User
+from .utils import get_recipes_limit
 
 
 class Base64ImageField(serializers.ImageField):
@@ -31,6 +34,94 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, проверяющий id списка одним in_bulk.
+
+    Перед валидацией списка BulkManyRelatedField или
+    BulkListSerializer загружают все объекты методом prefetch, и
+    каждый элемент берётся из словаря. Ошибки для отдельных id те же,
+    что у PrimaryKeyRelatedField. Без prefetch поле работает как
+    обычное.
+    """
+
+    objects = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Создаёт BulkManyRelatedField для many=True."""
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        """Приводит значение к типу первичного ключа или возвращает None."""
+        if isinstance(data, bool):
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def prefetch(self, values):
+        """Загружает объекты всех переданных id одним запросом."""
+        pks = {pk for pk in map(self.to_pk, values) if pk is not None}
+        self.objects = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        """Возвращает объект из загруженных или проверяет id запросом."""
+        if self.objects is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+        pk = self.to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.objects:
+            self.fail('does_not_exist', pk_value=data)
+        return self.objects[pk]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ManyRelatedField, загружающий все объекты списка сразу."""
+
+    def to_internal_value(self, data):
+        """Загружает объекты и валидирует элементы списка."""
+        if isinstance(data, (list, tuple)):
+            self.child_relation.prefetch(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child_relation.objects = None
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """ListSerializer, загружающий объекты BulkPrimaryKeyRelatedField.
+
+    Id из всех элементов списка собираются по каждому такому полю
+    и проверяются одним запросом на модель.
+    """
+
+    def get_bulk_fields(self):
+        """Возвращает поля дочернего сериализатора с пакетной загрузкой."""
+        return [
+            field for field in self.child.fields.values()
+            if isinstance(field, BulkPrimaryKeyRelatedField)]
+
+    def to_internal_value(self, data):
+        """Загружает объекты и валидирует элементы списка."""
+        fields = self.get_bulk_fields()
+        if isinstance(data, list):
+            for field in fields:
+                field.prefetch(
+                    item[field.field_name] for item in data
+                    if isinstance(item, dict) and field.field_name in item)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.objects = None
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватара пользователя."""
 
@@ -76,6 +167,8 @@ class ReadUserSerializer(UserSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return request.user.follower.filter(
             author=obj
         ).exists()
@@ -179,13 +272,20 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
         """ReadRecipeSerializer метакласс."""
 
         model = Recipe
-        exclude = ['pub_date']
+        exclude = ['pub_date', 'modified', 'favorites_count',
+                   'in_carts_count', 'search_vector', 'feed_pulled']
+
+    def get_is(self, obj, annotation, queryset):
+        """DRY функция.
 
-    def get_is(self, obj, queryset):
-        """DRY функция."""
+        Если кверисет рецептов уже аннотирован флагом, берёт его,
+        иначе проверяет наличие записи отдельным запросом.
+        """
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         return queryset.filter(
             recipe=obj,
             user=request.user
@@ -193,23 +293,24 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """Возвращает True если объект в избранном."""
-        return self.get_is(obj, obj.favorite)
+        return self.get_is(obj, 'is_favorited', obj.favorite)
 
     def get_is_in_shopping_cart(self, obj):
         """Возвращает True если объект в корзине покупок."""
-        return self.get_is(obj, obj.shopping_cart)
+        return self.get_is(obj, 'is_in_shopping_cart', obj.shopping_cart)
 
 
 class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для записи модели IngredientInRecipe."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
 
     class Meta:
         """CreateIngredientInRecipeSerializer метакласс."""
 
         model = IngredientInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = BulkListSerializer
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
@@ -219,7 +320,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = CreateIngredientInRecipeSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
@@ -229,7 +330,8 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         """CreateRecipeSerializer метакласс."""
 
         model = Recipe
-        exclude = ['pub_date']
+        exclude = ['pub_date', 'modified', 'favorites_count',
+                   'in_carts_count', 'search_vector', 'feed_pulled']
         read_only_fields = ('author',)
 
     def validate(self, data):
@@ -288,20 +390,64 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe.tags.set(tags)
         return recipe
 
+    def update_ingredient_in_recipe(self, ingredients, recipe):
+        """Приводит ингредиенты рецепта к списку по разнице с текущими.
+
+        Добавляются только новые строки, удаляются только лишние,
+        а изменённые количества записываются одним bulk_update.
+        Текущие строки берутся из prefetch вьюсета, если он есть.
+        """
+        existing = {item.ingredient_id: item for item in recipe.recipe.all()}
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients}
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        removed = [item.pk for ingredient_id, item in existing.items()
+                   if ingredient_id not in amounts]
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'].pk not in existing]
+        if added:
+            self.create_ingredient_in_recipe(added, recipe)
+
     @transaction.atomic(durable=True)
     def update(self, instance, validated_data):
-        """Поведение при обновлении рецепта."""
-        recipe = instance
+        """Поведение при обновлении рецепта.
+
+        Ингредиенты обновляются по разнице, а теги перезаписываются,
+        только если набор изменился.
+        """
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        IngredientInRecipe.objects.filter(recipe=recipe).delete()
-        self.create_ingredient_in_recipe(ingredients, recipe)
+        self.update_ingredient_in_recipe(ingredients, instance)
         updated_instance = super().update(instance, validated_data)
-        updated_instance.tags.set(tags)
+        if {tag.pk for tag in tags} != {
+                tag.pk for tag in updated_instance.tags.all()}:
+            updated_instance.tags.set(tags)
         return updated_instance
 
     def to_representation(self, instance):
-        """Переопределяет вид ответа от api."""
+        """Переопределяет вид ответа от api.
+
+        Теги и ингредиенты подгружаются так же, как во вьюсете, чтобы
+        ответ не делал запрос на каждый ингредиент.
+        """
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')))
         return ReadRecipeSerializer(instance, context={
             'request': self.context.get('request')}
         ).data
@@ -325,8 +471,6 @@ class SubscribeSerializer(ReadUserSerializer):
     """Сериализатор для подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(
-        source='recipes.count')
 
     class Meta:
         """SubscribeSerializer метакласс."""
@@ -344,46 +488,21 @@ class SubscribeSerializer(ReadUserSerializer):
             'avatar'
         )
         read_only_fields = ('email', 'username', 'first_name',
-                            'last_name',)
-
-    def create(self, validated_data):
-        """Создаёт объект подписки."""
-        return Subscribe.objects.create(**validated_data)
-
-    def validate(self, data):
-        """Проверка подписки на самого себя и повторной подписки."""
-        author = self.context.get('author')
-        request = self.context.get('request')
-        is_subscribed = request.user.follower.filter(
-            author=author).exists()
-        if request.method == 'POST':
-            if request.user == author:
-                raise ValidationError(
-                    {'errors': 'Нельзя подписаться на самого себя!'}
-                )
-            if is_subscribed:
-                raise ValidationError(
-                    {'errors': 'Вы уже подписаны на этого автора!'}
-                )
-        if request.method == 'DELETE':
-            if not is_subscribed:
-                raise ValidationError(
-                    {'errors': 'Вы не подписаны на этого автора!'}
-                )
-        return data
+                            'last_name', 'recipes_count')
 
     def get_recipes(self, obj):
-        """Ограничивает выдачу рецептов по параметру recipes_limit."""
+        """Ограничивает выдачу рецептов по параметру recipes_limit.
+
+        Если рецепты уже выбраны вьюсетом в recipes_preview,
+        использует их без дополнительного запроса.
+        """
         request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            try:
-                limit = int(recipes_limit)
-                recipes = obj.recipes.all()[:limit]
-            except ValueError:
-                recipes = obj.recipes.all()
-        else:
+        recipes = getattr(obj, 'recipes_preview', None)
+        if recipes is None:
             recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         context = {'request': request}
         return ShoppingCartAndFavoriteSerializer(
             recipes,
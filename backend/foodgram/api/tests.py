@@ -1,7 +1,57 @@
 """Тесты приложения api."""
+import base64
+import io
+import json
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from http import HTTPStatus
+from unittest import mock, skipUnless
 
-from django.test import Client, TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import close_old_connections, connection
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.authentication import AUTH_TOKEN_CACHE_KEY, get_digest, token_cache
+from api.cache import get_cache_stats
+from api.links import decode_short_link, encode_recipe_id, legacy_links
+from api.pantry import pantry_index
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.utils import iterate_in_transaction
+from foodgram.db.pool import ConnectionPool, PoolTimeout
+from foodgram.routers import use_primary, use_replicas
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    RecipeLinks,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag,
+    Timeline)
+from users.models import Subscribe, User
 
 
 class FoodgramAPITestCase(TestCase):
@@ -9,6 +59,7 @@ class FoodgramAPITestCase(TestCase):
 
     def setUp(self):
         """Создаёт атрибут класса guest_client."""
+        cache.clear()
         self.guest_client = Client()
 
     def test_recipes_list(self):
@@ -20,3 +71,1695 @@ class FoodgramAPITestCase(TestCase):
         """Проверка доступности списка юзеров."""
         response = self.guest_client.get('/api/users/')
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class RecipeFeedQueriesTestCase(TestCase):
+    """Класс тестирования числа запросов ленты рецептов."""
+
+    RECIPES_COUNT = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт авторов, рецепты, подписки, избранное и корзину."""
+        cls.user = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Рецептов',
+            password='reader-password')
+        tags = [Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+                for i in range(2)]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(3)]
+        for i in range(cls.RECIPES_COUNT):
+            author = User.objects.create_user(
+                email=f'author{i}@foodgram.ru', username=f'author{i}',
+                first_name='Автор', last_name=f'№{i}',
+                password='author-password')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание')
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1)
+                for ingredient in ingredients)
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                Subscribe.objects.create(user=cls.user, author=author)
+            else:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_feed(self, limit):
+        """Запрашивает страницу ленты и возвращает ответ и число запросов."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.data['results']), limit)
+        return response, len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов к БД не растёт вместе с размером страницы."""
+        _, small_page_queries = self.get_feed(2)
+        _, large_page_queries = self.get_feed(self.RECIPES_COUNT)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_feed_flags_match_database(self):
+        """Аннотированные флаги совпадают с данными в БД."""
+        response, _ = self.get_feed(self.RECIPES_COUNT)
+        for item in response.data['results']:
+            recipe = Recipe.objects.get(pk=item['id'])
+            self.assertEqual(
+                item['is_favorited'],
+                Favorite.objects.filter(
+                    user=self.user, recipe=recipe).exists())
+            self.assertEqual(
+                item['is_in_shopping_cart'],
+                ShoppingCart.objects.filter(
+                    user=self.user, recipe=recipe).exists())
+            self.assertEqual(
+                item['author']['is_subscribed'],
+                Subscribe.objects.filter(
+                    user=self.user, author=recipe.author).exists())
+            self.assertEqual(len(item['tags']), 2)
+            self.assertEqual(len(item['ingredients']), 3)
+
+
+class SubscriptionsQueriesTestCase(TestCase):
+    """Класс тестирования числа запросов списка подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт подписчика и авторов с разным числом рецептов."""
+        cls.user = User.objects.create_user(
+            email='follower@foodgram.ru', username='follower',
+            first_name='Подписчик', last_name='Авторов',
+            password='follower-password')
+        for i in range(6):
+            author = User.objects.create_user(
+                email=f'writer{i}@foodgram.ru', username=f'writer{i}',
+                first_name='Автор', last_name=f'№{i}',
+                password='writer-password')
+            for j in range(i + 1):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {i}.{j}', text='Текст')
+            Subscribe.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_subscriptions(self, limit, recipes_limit):
+        """Запрашивает страницу подписок и считает запросы к БД."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/users/subscriptions/',
+                {'limit': limit, 'recipes_limit': recipes_limit})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response, len(queries)
+
+    def test_subscriptions_queries_do_not_depend_on_page_size(self):
+        """Число запросов не зависит от числа авторов на странице."""
+        _, small_page_queries = self.get_subscriptions(1, 2)
+        _, large_page_queries = self.get_subscriptions(6, 2)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_subscriptions_recipes_limit(self):
+        """Рецепты обрезаются по recipes_limit, а счётчик остаётся полным."""
+        response, _ = self.get_subscriptions(6, 2)
+        for author in response.data['results']:
+            recipes_count = Recipe.objects.filter(
+                author_id=author['id']).count()
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(author['recipes_count'], recipes_count)
+            self.assertEqual(
+                len(author['recipes']), min(recipes_count, 2))
+
+
+class AnonymousRecipeCacheTestCase(TestCase):
+    """Класс тестирования кэша ленты рецептов для анонимов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора и рецепт."""
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров',
+            password='cook-password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Сварить')
+        cls.recipe.tags.set([
+            Tag.objects.create(name='Обед', slug='lunch'),
+            Tag.objects.create(name='Ужин', slug='dinner')])
+        cls.tag = Tag.objects.create(name='Перекус', slug='snack')
+
+    def setUp(self):
+        """Очищает кэш и создаёт анонимный клиент."""
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_repeated_list_is_served_from_cache(self):
+        """Повторный запрос с тем же набором параметров попадает в кэш."""
+        first = self.guest_client.get(
+            '/api/recipes/', {'tags': ['lunch', 'dinner']})
+        with CaptureQueriesContext(connection) as queries:
+            second = self.guest_client.get(
+                '/api/recipes/?tags=dinner&tags=lunch')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_recipe_change_invalidates_cache(self):
+        """Изменение рецепта и его тегов сбрасывает закэшированные ответы."""
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.guest_client.get('/api/recipes/')
+        self.guest_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Щи'
+            self.recipe.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Щи')
+        self.guest_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.recipe_set.add(self.recipe)
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['tags']), 3)
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_author_and_ingredient_change_invalidates_cache(self):
+        """Изменение автора и ингредиента сбрасывает ответы с рецептом."""
+        ingredient = Ingredient.objects.create(
+            name='Свёкла', measurement_unit='г')
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe, ingredient=ingredient, amount=1)
+        url = f'/api/recipes/{self.recipe.pk}/'
+        for instance, field, value, read in (
+                (self.author, 'first_name', 'Шеф',
+                 lambda data: data['author']['first_name']),
+                (ingredient, 'name', 'Бурак',
+                 lambda data: data['ingredients'][0]['name'])):
+            with self.subTest(field=field):
+                self.guest_client.get('/api/recipes/')
+                self.guest_client.get(url)
+                with self.captureOnCommitCallbacks(execute=True):
+                    setattr(instance, field, value)
+                    instance.save()
+                for path in (url, '/api/recipes/'):
+                    response = self.guest_client.get(path)
+                    self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(
+                    read(self.guest_client.get(url).json()), value)
+
+    def test_tag_change_invalidates_cache(self):
+        """Изменение и удаление тега сбрасывает ответы с рецептом."""
+        url = f'/api/recipes/{self.recipe.pk}/'
+        tag = self.recipe.tags.get(slug='lunch')
+
+        def assert_invalidated(tags):
+            for path in (url, '/api/recipes/'):
+                response = self.guest_client.get(path)
+                self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(
+                {item['name'] for item in response.json()['results'][0][
+                    'tags']}, tags)
+
+        self.guest_client.get('/api/recipes/')
+        self.guest_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Полдник'
+            tag.save()
+        assert_invalidated({'Полдник', 'Ужин'})
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        assert_invalidated({'Ужин'})
+
+    def test_authenticated_requests_bypass_cache(self):
+        """Ответы авторизованным пользователям не кэшируются."""
+        client = APIClient()
+        client.force_authenticate(self.author)
+        client.get('/api/recipes/')
+        response = client.get('/api/recipes/')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(get_cache_stats(), {'hits': 0, 'misses': 0})
+
+
+class IngredientSearchTestCase(TestCase):
+    """Класс тестирования поиска ингредиентов по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт ингредиенты."""
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Сыр твёрдый', 'сырок', 'Творожный сыр', 'Соль'))
+
+    def setUp(self):
+        """Очищает кэш, чтобы индекс построился заново."""
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_search_ranks_prefix_before_substring(self):
+        """Совпадения по префиксу идут раньше совпадений по подстроке."""
+        self.guest_client.get('/api/ingredients/', {'name': 'с'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                '/api/ingredients/', {'name': 'СЫР'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()],
+            ['Сыр твёрдый', 'сырок', 'Творожный сыр'])
+
+    def test_search_sees_new_ingredient(self):
+        """Индекс перестраивается после добавления ингредиента."""
+        self.guest_client.get('/api/ingredients/', {'name': 'сыр'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Сыр плавленый',
+                                      measurement_unit='г')
+        response = self.guest_client.get('/api/ingredients/', {'name': 'сыр'})
+        self.assertIn('Сыр плавленый',
+                      [ingredient['name'] for ingredient in response.json()])
+
+
+class ShoppingCartDownloadTestCase(TestCase):
+    """Класс тестирования выгрузки корзины покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт два рецепта с общим ингредиентом в корзине."""
+        cls.user = User.objects.create_user(
+            email='buyer@foodgram.ru', username='buyer',
+            first_name='Покупатель', last_name='Продуктов',
+            password='buyer-password')
+        flour = Ingredient.objects.create(name='Мука', measurement_unit='г')
+        milk = Ingredient.objects.create(name='Молоко', measurement_unit='мл')
+        for name, amounts in (('Блины', (200, 500)), ('Оладьи', (300, 0))):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=name, text='Пожарить')
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount)
+                for ingredient, amount in zip((flour, milk), amounts)
+                if amount)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, export_format):
+        """Скачивает корзину покупок в указанном формате."""
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'format': export_format})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ingredients_are_merged_across_recipes(self):
+        """Одинаковые ингредиенты из разных рецептов суммируются."""
+        self.assertEqual(
+            self.download('csv').splitlines(),
+            ['Ингредиент,Единица измерения,Количество',
+             'Молоко,мл,500',
+             'Мука,г,500'])
+
+    def test_json_and_txt_formats(self):
+        """Выгрузка доступна в json и txt."""
+        self.assertEqual(
+            json.loads(self.download('json')),
+            [{'name': 'Молоко', 'measurement_unit': 'мл', 'amount': 500},
+             {'name': 'Мука', 'measurement_unit': 'г', 'amount': 500}])
+        self.assertIn('- Мука (г) — 500', self.download('txt'))
+
+    def test_unknown_format(self):
+        """Неизвестный формат возвращает ошибку 400."""
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'xlsx'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_transaction_only_behind_pgbouncer(self):
+        """Транзакция на время выгрузки открывается только за pgbouncer."""
+        queryset = Ingredient.objects.order_by('pk')
+        expected = list(queryset)
+        for pgbouncer in (False, True):
+            with self.subTest(pgbouncer=pgbouncer), mock.patch.dict(
+                    connection.settings_dict,
+                    PGBOUNCER_TRANSACTION_MODE=pgbouncer), mock.patch(
+                    'api.utils.transaction.atomic') as atomic:
+                self.assertEqual(
+                    list(iterate_in_transaction(queryset, 1)), expected)
+                self.assertEqual(atomic.called, pgbouncer)
+
+    def test_streaming_under_asgi(self):
+        """Под ASGI первые байты отправляются до чтения всех строк."""
+        token = Token.objects.create(user=self.user)
+        events = []
+
+        def iterate(queryset, chunk_size):
+            for row in iterate_in_transaction(queryset, chunk_size):
+                events.append('row')
+                yield row
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                events.append(message.get('body', b''))
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/api/recipes/download_shopping_cart/',
+            'raw_path': b'/api/recipes/download_shopping_cart/',
+            'query_string': b'format=csv',
+            'headers': [(b'host', b'testserver'),
+                        (b'authorization', f'Token {token.key}'.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+        request_started.disconnect(close_old_connections)
+        try:
+            with mock.patch('api.views.iterate_in_transaction', iterate), \
+                    mock.patch('api.utils.SHOPPING_CART_CHUNK_SIZE', 1):
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+        rows = [index for index, event in enumerate(events) if event == 'row']
+        first_body = next(
+            index for index, event in enumerate(events)
+            if event not in ('row', b''))
+        self.assertLess(first_body, rows[-1])
+        self.assertEqual(
+            b''.join(event for event in events if event != 'row').decode(),
+            self.download('csv'))
+
+
+class QueryTimingMiddlewareTestCase(TestCase):
+    """Класс тестирования замеров запросов к БД."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт пользователей."""
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{i}@foodgram.ru', username=f'user{i}',
+                first_name='Пользователь', last_name=f'№{i}',
+                password='user-password')
+            for i in range(3)]
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_server_timing_header(self):
+        """Ответ содержит время в БД и число запросов."""
+        with self.assertLogs('foodgram.requests', 'INFO') as logs:
+            response = self.client.get('/api/users/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'total;dur=[\d.]+, app;dur=[\d.-]+, '
+            r'db;dur=[\d.]+;desc="\d+ queries"')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/api/users/')
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(REQUEST_TIMING_N_PLUS_ONE_THRESHOLD=2)
+    def test_repeated_queries_are_reported(self):
+        """Повтор одного и того же SQL выше порога попадает в лог."""
+        with self.assertLogs('foodgram.requests', 'WARNING') as logs:
+            self.client.get('/api/users/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'n_plus_one')
+        self.assertEqual(record['count'], len(self.users))
+
+    @override_settings(REQUEST_TIMING_N_PLUS_ONE_THRESHOLD=2)
+    def test_queries_are_recorded_under_asgi(self):
+        """Под ASGI учитываются запросы из потоков sync_to_async."""
+        token = Token.objects.create(user=self.users[0])
+        headers = {}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                headers.update(
+                    (name.decode(), value.decode())
+                    for name, value in message['headers'])
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/api/users/', 'raw_path': b'/api/users/',
+            'query_string': b'',
+            'headers': [(b'host', b'testserver'),
+                        (b'authorization', f'Token {token.key}'.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+        request_started.disconnect(close_old_connections)
+        try:
+            with self.assertLogs('foodgram.requests', 'INFO') as logs:
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertRegex(headers['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertGreater(records[0]['queries'], 0)
+        self.assertEqual(records[1]['event'], 'n_plus_one')
+        self.assertEqual(records[1]['count'], len(self.users))
+
+
+class CountersTestCase(TestCase):
+    """Класс тестирования денормализованных счётчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора, читателя и рецепт."""
+        cls.author = User.objects.create_user(
+            email='chef@foodgram.ru', username='chef',
+            first_name='Шеф', last_name='Повар',
+            password='chef-password')
+        cls.user = User.objects.create_user(
+            email='fan@foodgram.ru', username='fan',
+            first_name='Поклонник', last_name='Шефа',
+            password='fan-password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Плов', text='Приготовить')
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertCounters(self, favorites, carts, followers):
+        """Сверяет счётчики рецепта и автора."""
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, favorites)
+        self.assertEqual(self.recipe.in_carts_count, carts)
+        self.assertEqual(self.author.followers_count, followers)
+        self.assertEqual(self.author.recipes_count, 1)
+
+    def test_counters_follow_api_actions(self):
+        """Счётчики меняются вместе с избранным, корзиной и подписками."""
+        recipe_url = f'/api/recipes/{self.recipe.pk}/'
+        subscribe_url = f'/api/users/{self.author.pk}/subscribe/'
+        self.client.post(recipe_url + 'favorite/')
+        self.client.post(recipe_url + 'shopping_cart/')
+        self.client.post(subscribe_url)
+        self.assertCounters(favorites=1, carts=1, followers=1)
+        self.client.post(recipe_url + 'favorite/')
+        self.assertCounters(favorites=1, carts=1, followers=1)
+        self.client.delete(recipe_url + 'favorite/')
+        self.client.delete(recipe_url + 'shopping_cart/')
+        self.client.delete(subscribe_url)
+        self.assertCounters(favorites=0, carts=0, followers=0)
+
+    def test_recount_counters(self):
+        """Команда пересчёта восстанавливает счётчики после bulk_create."""
+        Favorite.objects.bulk_create([
+            Favorite(user=self.user, recipe=self.recipe),
+            Favorite(user=self.author, recipe=self.recipe)])
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        call_command('recount_counters', stdout=io.StringIO())
+        self.assertCounters(favorites=2, carts=0, followers=0)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Класс тестирования курсорной пагинации ленты."""
+
+    RECIPES_COUNT = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепты с одинаковой датой публикации и тегами."""
+        cls.author = User.objects.create_user(
+            email='writer@foodgram.ru', username='writer',
+            first_name='Автор', last_name='Ленты',
+            password='writer-password')
+        cls.tag = Tag.objects.create(name='Суп', slug='soup')
+        recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание')
+            for i in range(cls.RECIPES_COUNT)]
+        Recipe.objects.update(pub_date=recipes[0].pub_date)
+        for recipe in recipes[::2]:
+            recipe.tags.add(cls.tag)
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def walk(self, params):
+        """Проходит ленту курсором и возвращает id и число запросов."""
+        ids, queries = [], []
+        url, data = '/api/recipes/', {'cursor': '', 'limit': 3, **params}
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, data)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertNotIn('count', response.data)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            queries.append(len(captured))
+            url, data = response.data['next'], None
+        return ids, queries
+
+    def test_cursor_matches_page_numbers(self):
+        """Курсор обходит ленту в том же порядке, что и номера страниц."""
+        for params in ({}, {'tags': self.tag.slug}):
+            with self.subTest(params=params):
+                ids, queries = self.walk(params)
+                response = self.client.get(
+                    '/api/recipes/', {'limit': self.RECIPES_COUNT, **params})
+                self.assertEqual(
+                    ids,
+                    [recipe['id'] for recipe in response.data['results']])
+                self.assertEqual(len(set(queries)), 1)
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор возвращает 404."""
+        response = self.client.get('/api/recipes/', {'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cursor_with_search(self):
+        """Курсор с сортировкой по релевантности поиска возвращает 400."""
+        response = self.client.get(
+            '/api/recipes/', {'cursor': '', 'search': 'Рецепт'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class CachedCountTestCase(TestCase):
+    """Класс тестирования кэшированного count пагинации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора и рецепты."""
+        cls.author = User.objects.create_user(
+            email='counter@foodgram.ru', username='counter',
+            first_name='Автор', last_name='Счётчика',
+            password='counter-password')
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание')
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_count(self, params=None):
+        """Возвращает count, его точность и число запросов к БД."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return (response.data['count'], response.data['count_is_exact'],
+                len(queries))
+
+    def test_count_is_cached_until_write(self):
+        """Повторный запрос идёт без COUNT, новый рецепт сбрасывает кэш."""
+        count, exact, first_queries = self.get_count()
+        self.assertEqual((count, exact), (3, True))
+        count, _, second_queries = self.get_count()
+        self.assertEqual(count, 3)
+        self.assertEqual(second_queries, first_queries - 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                author=self.author, name='Новый', text='Описание')
+        self.assertEqual(self.get_count()[0], 4)
+        self.assertEqual(
+            self.get_count({'author': self.author.pk})[0], 4)
+
+    def test_unfiltered_count_uses_estimate(self):
+        """Без фильтров count берётся из оценки и помечается неточным."""
+        with mock.patch('api.counts.get_estimate', return_value=10 ** 6):
+            count, exact, _ = self.get_count()
+            self.assertEqual((count, exact), (10 ** 6, False))
+            count, exact, _ = self.get_count({'author': self.author.pk})
+            self.assertEqual((count, exact), (3, True))
+
+
+class ShortLinkTestCase(TestCase):
+    """Класс тестирования коротких ссылок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепт и старую короткую ссылку."""
+        author = User.objects.create_user(
+            email='linker@foodgram.ru', username='linker',
+            first_name='Автор', last_name='Ссылок',
+            password='linker-password')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Сварить')
+        RecipeLinks.objects.create(short_link='aB3xZ', recipe=cls.recipe)
+
+    def setUp(self):
+        """Сбрасывает словарь старых ссылок."""
+        legacy_links.clear()
+
+    def test_codes_round_trip(self):
+        """Код обратимо превращается в id, а соседние коды различаются."""
+        ids = [1, 2, 3, 10 ** 6, 62 ** 6 + 5]
+        codes = [encode_recipe_id(pk) for pk in ids]
+        self.assertEqual(len(set(codes)), len(ids))
+        for pk, code in zip(ids, codes):
+            self.assertGreaterEqual(len(code), 6)
+            self.assertEqual(decode_short_link(code), pk)
+        self.assertIsNone(decode_short_link('!bad!!'))
+
+    def test_redirect_checks_recipe_only(self):
+        """Новая ссылка редиректит на рецепт, проверив только его наличие."""
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/get-link/')
+        short_link = response.json()['short-link']
+        self.assertNotIn('aB3xZ', short_link)
+        with self.assertNumQueries(1):
+            response = self.client.get(short_link)
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{self.recipe.pk}/',
+            fetch_redirect_response=False)
+
+    def test_missing_recipe(self):
+        """Ссылки на несуществующий рецепт нет, её код возвращает 404."""
+        missing = self.recipe.pk + 1
+        response = self.client.get(f'/api/recipes/{missing}/get-link/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(f'/s/{encode_recipe_id(missing)}')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_legacy_link_and_unknown_code(self):
+        """Старая ссылка работает, неизвестный код возвращает 404."""
+        response = self.client.get('/s/aB3xZ')
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{self.recipe.pk}/',
+            fetch_redirect_response=False)
+        self.assertEqual(
+            self.client.get('/s/zzzzz').status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(RecipeLinks.objects.exclude(
+            short_link='aB3xZ').exists())
+
+
+class MembershipTestCase(TestCase):
+    """Класс тестирования избранного, корзины и подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора, читателя и рецепт."""
+        cls.author = User.objects.create_user(
+            email='baker@foodgram.ru', username='baker',
+            first_name='Пекарь', last_name='Автор',
+            password='baker-password')
+        cls.user = User.objects.create_user(
+            email='eater@foodgram.ru', username='eater',
+            first_name='Едок', last_name='Читатель',
+            password='eater-password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Хлеб', text='Испечь')
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_single_statement_per_action(self):
+        """Добавление и удаление обходятся без SELECT перед записью."""
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        for method, expected in (('post', HTTPStatus.CREATED),
+                                 ('delete', HTTPStatus.NO_CONTENT)):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url)
+            self.assertEqual(response.status_code, expected)
+            statements = [
+                query['sql'].split()[0] for query in queries
+                if 'SAVEPOINT' not in query['sql']]
+            self.assertNotIn('SELECT', statements)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+
+    def test_status_codes(self):
+        """Повтор даёт 400, отсутствующий объект — 404."""
+        for action in ('favorite', 'shopping_cart'):
+            with self.subTest(action=action):
+                url = f'/api/recipes/{self.recipe.pk}/{action}/'
+                response = self.client.post(url)
+                self.assertEqual(response.status_code, HTTPStatus.CREATED)
+                self.assertEqual(response.data['name'], self.recipe.name)
+                self.assertEqual(
+                    self.client.post(url).status_code,
+                    HTTPStatus.BAD_REQUEST)
+                self.assertEqual(
+                    self.client.delete(url).status_code,
+                    HTTPStatus.NO_CONTENT)
+                self.assertEqual(
+                    self.client.delete(url).status_code,
+                    HTTPStatus.BAD_REQUEST)
+                self.assertEqual(
+                    self.client.post(
+                        f'/api/recipes/{self.recipe.pk + 100}/{action}/'
+                    ).status_code,
+                    HTTPStatus.NOT_FOUND)
+
+    def test_subscribe_status_codes(self):
+        """Подписка на себя и повторная подписка дают 400."""
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(response.data['is_subscribed'])
+        self.assertEqual(response.data['recipes_count'], 1)
+        self.assertEqual(
+            self.client.post(url).status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(
+                f'/api/users/{self.user.pk}/subscribe/').status_code,
+            HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(
+                f'/api/users/{self.author.pk + 100}/subscribe/').status_code,
+            HTTPStatus.NOT_FOUND)
+        self.assertEqual(
+            self.client.delete(url).status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(
+            self.client.delete(url).status_code, HTTPStatus.BAD_REQUEST)
+
+
+class ConcurrentMembershipTestCase(TransactionTestCase):
+    """Класс тестирования параллельных одинаковых запросов."""
+
+    THREADS = 8
+
+    def setUp(self):
+        """Создаёт автора, читателя и рецепт."""
+        self.author = User.objects.create_user(
+            email='racer@foodgram.ru', username='racer',
+            first_name='Автор', last_name='Гонки',
+            password='racer-password')
+        self.user = User.objects.create_user(
+            email='clicker@foodgram.ru', username='clicker',
+            first_name='Читатель', last_name='Гонки',
+            password='clicker-password')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Торт', text='Испечь')
+
+    def run_concurrently(self, method, url):
+        """Отправляет одинаковые запросы из нескольких потоков сразу."""
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrent_duplicates(self):
+        """Из параллельных дублей проходит ровно один запрос."""
+        urls = (f'/api/recipes/{self.recipe.pk}/favorite/',
+                f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+                f'/api/users/{self.author.pk}/subscribe/')
+        for method, success in (('post', HTTPStatus.CREATED),
+                                ('delete', HTTPStatus.NO_CONTENT)):
+            for url in urls:
+                with self.subTest(method=method, url=url):
+                    self.assertEqual(
+                        self.run_concurrently(method, url),
+                        [success] + [HTTPStatus.BAD_REQUEST]
+                        * (self.THREADS - 1))
+            self.recipe.refresh_from_db()
+            self.author.refresh_from_db()
+            expected = int(method == 'post')
+            self.assertEqual(self.recipe.favorites_count, expected)
+            self.assertEqual(self.recipe.in_carts_count, expected)
+            self.assertEqual(self.author.followers_count, expected)
+
+
+class RecipeUpdateTestCase(TestCase):
+    """Класс тестирования обновления рецепта по разнице."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепт с тегами и ингредиентами."""
+        cls.author = User.objects.create_user(
+            email='editor@foodgram.ru', username='editor',
+            first_name='Автор', last_name='Правок',
+            password='editor-password')
+        cls.tags = [Tag.objects.create(name=f'Тег {i}', slug=f'edit{i}')
+                    for i in range(2)]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {i}', measurement_unit='г')
+            for i in range(4)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Сварить')
+        cls.recipe.tags.set(cls.tags)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=cls.recipe, ingredient=ingredient, amount=10)
+            for ingredient in cls.ingredients[:3])
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, amounts, **data):
+        """Обновляет рецепт и возвращает выполненные запросы."""
+        payload = {
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': self.ingredients[index].pk, 'amount': amount}
+                for index, amount in amounts.items()],
+            **data}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [query['sql'] for query in queries]
+
+    def test_name_change_does_not_touch_relations(self):
+        """Смена названия не пишет в ингредиенты и теги."""
+        queries = self.patch({0: 10, 1: 10, 2: 10}, name='Новая каша')
+        for table in (IngredientInRecipe._meta.db_table,
+                      Recipe.tags.through._meta.db_table):
+            self.assertFalse([
+                sql for sql in queries
+                if table in sql and not sql.startswith('SELECT')])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Новая каша')
+
+    def test_ingredients_are_diffed(self):
+        """Неизменённые строки сохраняются, остальные правятся."""
+        kept = IngredientInRecipe.objects.get(
+            recipe=self.recipe, ingredient=self.ingredients[0]).pk
+        self.patch({0: 10, 1: 25, 3: 5})
+        self.assertEqual(
+            dict(IngredientInRecipe.objects.filter(
+                recipe=self.recipe).values_list('ingredient', 'amount')),
+            {self.ingredients[0].pk: 10, self.ingredients[1].pk: 25,
+             self.ingredients[3].pk: 5})
+        self.assertTrue(IngredientInRecipe.objects.filter(pk=kept).exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeCreateQueriesTestCase(TestCase):
+    """Класс тестирования числа запросов при создании рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора, теги и ингредиенты."""
+        cls.author = User.objects.create_user(
+            email='creator@foodgram.ru', username='creator',
+            first_name='Автор', last_name='Рецептов',
+            password='creator-password')
+        cls.tags = [Tag.objects.create(name=f'Тег {i}', slug=f'new{i}')
+                    for i in range(3)]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Компонент {i}', measurement_unit='г')
+            for i in range(20)]
+        buffer = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+        cls.image = ('data:image/png;base64,'
+                     + base64.b64encode(buffer.getvalue()).decode())
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create(self, ingredient_ids, tag_ids):
+        """Создаёт рецепт и возвращает ответ и число запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/recipes/', {
+                'name': 'Салат',
+                'text': 'Нарезать',
+                'cooking_time': 5,
+                'image': self.image,
+                'tags': tag_ids,
+                'ingredients': [
+                    {'id': pk, 'amount': 10} for pk in ingredient_ids],
+            }, format='json')
+        return response, len(queries)
+
+    def test_queries_do_not_depend_on_ingredient_count(self):
+        """Число запросов не растёт с числом ингредиентов и тегов."""
+        response, few = self.create(
+            [self.ingredients[0].pk], [self.tags[0].pk])
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response, many = self.create(
+            [ingredient.pk for ingredient in self.ingredients],
+            [tag.pk for tag in self.tags])
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(len(response.data['ingredients']), 20)
+        self.assertEqual(few, many)
+
+    def test_unknown_ids_are_reported(self):
+        """Несуществующие id дают те же ошибки, что PrimaryKeyRelatedField."""
+        response, _ = self.create(
+            [self.ingredients[0].pk, 10 ** 6], [self.tags[0].pk, 'x'])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        field = PrimaryKeyRelatedField(queryset=Tag.objects.all())
+        self.assertEqual(
+            response.data['ingredients'][1]['id'],
+            [field.error_messages['does_not_exist'].format(
+                pk_value=10 ** 6)])
+        self.assertEqual(
+            response.data['tags'],
+            [field.error_messages['incorrect_type'].format(
+                data_type='str')])
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """Класс тестирования кэширования токенов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт пользователя."""
+        cls.password = 'token-password'
+        cls.user = User.objects.create_user(
+            email='token@foodgram.ru', username='token',
+            first_name='Держатель', last_name='Токена',
+            password=cls.password)
+
+    def setUp(self):
+        """Получает токен и очищает кэши."""
+        cache.clear()
+        token_cache.clear_local()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': self.password})
+        self.key = response.data['auth_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def get_me(self):
+        """Запрашивает профиль и возвращает статус и запросы к токенам."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+        return response.status_code, [
+            query['sql'] for query in queries
+            if 'authtoken_token' in query['sql']]
+
+    def test_token_is_cached(self):
+        """Повторный запрос не обращается к таблице токенов."""
+        status_code, queries = self.get_me()
+        self.assertEqual(status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), 1)
+        token_cache.clear_local()
+        self.assertEqual(self.get_me(), (HTTPStatus.OK, []))
+        self.assertEqual(self.get_me(), (HTTPStatus.OK, []))
+
+    def test_logout_and_deactivation_invalidate_cache(self):
+        """Выход и деактивация сразу отзывают закэшированный токен."""
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/')
+        self.assertEqual(self.get_me()[0], HTTPStatus.UNAUTHORIZED)
+        self.setUp()
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_me()[0], HTTPStatus.UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """После смены пароля пользователь снова читается из БД."""
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': self.password,
+                'new_password': 'another-token-password'})
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        status_code, queries = self.get_me()
+        self.assertEqual(status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), 1)
+
+    def test_password_hash_is_not_cached(self):
+        """В кэше нет хэша пароля, а сохранение пользователя его не стирает."""
+        self.get_me()
+        self.assertNotIn(self.user.password, repr(cache.get(
+            AUTH_TOKEN_CACHE_KEY.format(digest=get_digest(self.key)))))
+        user = token_cache.get(self.key).user
+        self.assertEqual(user.get_deferred_fields(), {'password'})
+        user.first_name = 'Новое'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Новое')
+        self.assertTrue(self.user.check_password(self.password))
+
+
+class RecipeSearchTestCase(TestCase):
+    """Класс тестирования поиска рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепты с совпадением в названии и в описании."""
+        author = User.objects.create_user(
+            email='searcher@foodgram.ru', username='searcher',
+            first_name='Автор', last_name='Поиска',
+            password='searcher-password')
+        cls.in_text = Recipe.objects.create(
+            author=author, name='Ужин', text='Подать с картофелем')
+        cls.in_name = Recipe.objects.create(
+            author=author, name='Картофель по-деревенски', text='Запечь')
+        Recipe.objects.create(author=author, name='Чай', text='Заварить')
+
+    def search(self, **params):
+        """Возвращает id найденных рецептов."""
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_name_matches_rank_first(self):
+        """Совпадения в названии выше совпадений в описании."""
+        for mode in ('fts', 'trigram'):
+            with self.subTest(mode=mode):
+                self.assertEqual(
+                    self.search(search='картофел', search_mode=mode),
+                    [self.in_name.pk, self.in_text.pk])
+
+    def test_unknown_mode(self):
+        """Неизвестный режим поиска даёт 400."""
+        response = self.client.get(
+            '/api/recipes/', {'search': 'чай', 'search_mode': 'regex'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_vector_is_not_loaded(self):
+        """Лента не выбирает поисковый вектор."""
+        with CaptureQueriesContext(connection) as queries:
+            self.search()
+        self.assertFalse([
+            query for query in queries
+            if 'search_vector' in query['sql']])
+
+
+class PantryTestCase(TestCase):
+    """Класс тестирования подбора рецептов по ингредиентам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепты с разными наборами ингредиентов."""
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Кладовой',
+            password='cook-password')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Запас {i}', measurement_unit='г')
+            for i in range(4)]
+        cls.full = cls.create_recipe('Омлет', [0, 1])
+        cls.half = cls.create_recipe('Суп', [0, 1, 2, 3])
+        cls.other = cls.create_recipe('Компот', [3])
+
+    @classmethod
+    def create_recipe(cls, name, indexes):
+        """Создаёт рецепт с ингредиентами по номерам."""
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Приготовить')
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=cls.ingredients[index], amount=1)
+            for index in indexes)
+        return recipe
+
+    def setUp(self):
+        """Сбрасывает кэш, чтобы индекс строился заново."""
+        cache.clear()
+
+    def pantry(self, *indexes, **params):
+        """Возвращает id, число имеющихся и недостающих ингредиентов."""
+        response = self.client.get('/api/recipes/pantry/', {
+            'ingredients': ','.join(
+                str(self.ingredients[index].pk) for index in indexes),
+            **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [
+            (recipe['id'], recipe['matched_ingredients'],
+             recipe['missing_ingredients'])
+            for recipe in response.json()]
+
+    def test_ranking_by_coverage(self):
+        """Рецепты сортируются по доле имеющихся ингредиентов."""
+        self.assertEqual(self.pantry(0, 1), [
+            (self.full.pk, 2, 0), (self.half.pk, 2, 2)])
+        self.assertEqual(
+            self.pantry(0, 1, limit=1), [(self.full.pk, 2, 0)])
+
+    def test_incremental_update(self):
+        """Изменения рецептов применяются без перестройки индекса."""
+        self.pantry(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientInRecipe.objects.create(
+                recipe=self.other, ingredient=self.ingredients[0], amount=1)
+            self.half.delete()
+        with mock.patch.object(pantry_index, 'build') as build:
+            self.assertEqual(self.pantry(0), [
+                (self.other.pk, 1, 1), (self.full.pk, 1, 1)])
+        build.assert_not_called()
+
+    def test_invalid_ingredients(self):
+        """Без ингредиентов или с некорректным id ответ 400."""
+        for value in ('', 'abc', '1,x'):
+            with self.subTest(value=value):
+                response = self.client.get(
+                    '/api/recipes/pantry/', {'ingredients': value})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class SimilarRecipesTestCase(TestCase):
+    """Класс тестирования похожих рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт рецепты с пересекающимися ингредиентами."""
+        cls.author = User.objects.create_user(
+            email='similar@foodgram.ru', username='similar',
+            first_name='Автор', last_name='Похожих',
+            password='similar-password')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Основа {i}', measurement_unit='г')
+            for i in range(5)]
+        cls.first = cls.create_recipe('Плов', [0, 1, 2])
+        cls.second = cls.create_recipe('Рагу', [0, 1, 3])
+        cls.third = cls.create_recipe('Салат', [0, 4])
+        cls.fourth = cls.create_recipe('Соус', [4])
+
+    @classmethod
+    def create_recipe(cls, name, indexes):
+        """Создаёт рецепт с ингредиентами по номерам."""
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Приготовить')
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=cls.ingredients[index], amount=1)
+            for index in indexes)
+        return recipe
+
+    def build(self, *args):
+        """Запускает расчёт похожих рецептов."""
+        call_command('build_similar_recipes', *args, stdout=io.StringIO())
+
+    def similar(self, recipe):
+        """Возвращает id похожих рецептов."""
+        response = self.client.get(f'/api/recipes/{recipe.pk}/similar/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [item['id'] for item in response.json()]
+
+    def test_similar_by_cosine(self):
+        """Рецепты сортируются по косинусному сходству."""
+        self.build()
+        self.assertEqual(
+            self.similar(self.first), [self.second.pk, self.third.pk])
+        self.assertEqual(self.similar(self.fourth), [self.third.pk])
+        self.assertAlmostEqual(SimilarRecipe.objects.get(
+            recipe=self.first, similar=self.second).score, 2 / 3)
+
+    def test_single_lookup(self):
+        """Похожие рецепты читаются без расчёта сходства."""
+        self.build()
+        with CaptureQueriesContext(connection) as queries:
+            self.similar(self.first)
+        self.assertEqual(len(queries), 3)
+        self.assertIn('recipes_similarrecipe', queries[0]['sql'])
+
+    def test_incremental_refresh(self):
+        """Изменённый рецепт появляется в списках других рецептов."""
+        self.build()
+        IngredientInRecipe.objects.create(
+            recipe=self.fourth, ingredient=self.ingredients[2], amount=1)
+        self.fourth.save()
+        built = SimilarRecipe.objects.filter(
+            recipe=self.second).values_list('built_at', flat=True)[0]
+        self.build('--incremental')
+        self.assertEqual(self.similar(self.first), [
+            self.second.pk, self.fourth.pk, self.third.pk])
+        self.assertEqual(SimilarRecipe.objects.filter(
+            recipe=self.second).values_list('built_at', flat=True)[0], built)
+
+    def test_missing_recipe(self):
+        """Для несуществующего рецепта ответ 404."""
+        response = self.client.get('/api/recipes/0/similar/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FeedTestCase(TestCase):
+    """Класс тестирования ленты подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт читателя, обычного и популярного автора."""
+        cls.reader, cls.author, cls.star = (
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name,
+                first_name='Имя', last_name='Фамилия',
+                password=f'{name}-password')
+            for name in ('reader', 'author', 'star'))
+        for author in (cls.author, cls.star):
+            Subscribe.objects.create(user=cls.reader, author=author)
+        User.objects.filter(pk=cls.star.pk).update(followers_count=10 ** 6)
+
+    def setUp(self):
+        """Создаёт авторизованный клиент."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, count):
+        """Публикует рецепты и выполняет fan-out."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return [
+                Recipe.objects.create(
+                    author=author, name=f'Новинка {i}', text='Текст').pk
+                for i in range(count)]
+
+    def read_feed(self, limit):
+        """Обходит ленту по курсору и возвращает id рецептов."""
+        ids, url, params = [], '/api/recipes/feed/', {'limit': limit}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url, params = response.data['next'], None
+        return ids
+
+    def test_fan_out_on_write_and_read(self):
+        """Лента сливает Timeline и рецепты популярных авторов."""
+        published = []
+        for author in (self.author, self.star, self.author, self.star):
+            published += self.publish(author, 2)
+        self.assertEqual(
+            set(Timeline.objects.filter(user=self.reader).values_list(
+                'recipe__author', flat=True)), {self.author.pk})
+        for limit in (1, 3, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.read_feed(limit), published[::-1])
+
+    def test_threshold_crossing(self):
+        """Рецепты не пропадают, когда автор переходит порог."""
+        published = self.publish(self.star, 2)
+        User.objects.filter(pk=self.star.pk).update(followers_count=1)
+        published += self.publish(self.star, 1)
+        User.objects.filter(pk=self.star.pk).update(followers_count=10 ** 6)
+        published += self.publish(self.star, 1)
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=published).order_by(
+                'pk').values_list('feed_pulled', flat=True)),
+            [True, True, False, True])
+        for followers_count in (1, 10 ** 6):
+            User.objects.filter(pk=self.star.pk).update(
+                followers_count=followers_count)
+            with self.subTest(followers_count=followers_count):
+                self.assertEqual(self.read_feed(10), published[::-1])
+
+    def test_timeline_is_trimmed(self):
+        """Лента обрезается до FEED_TIMELINE_LENGTH записей."""
+        with mock.patch('api.feed.FEED_TIMELINE_LENGTH', 2):
+            published = self.publish(self.author, 3)
+        self.assertEqual(
+            list(Timeline.objects.filter(user=self.reader).order_by(
+                '-pub_date', '-recipe').values_list('recipe', flat=True)),
+            published[:0:-1])
+
+    def test_subscribe_and_unsubscribe(self):
+        """Подписка добавляет прошлые рецепты автора, отписка убирает."""
+        published = self.publish(self.author, 2)
+        other = User.objects.create_user(
+            email='late@foodgram.ru', username='late',
+            first_name='Имя', last_name='Фамилия', password='late-password')
+        self.client.force_authenticate(other)
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        self.assertEqual(self.read_feed(10), published[::-1])
+        self.client.delete(url)
+        self.assertEqual(self.read_feed(10), [])
+
+    def test_backfill_command(self):
+        """Команда заполняет ленты подписок, созданных в обход API."""
+        published = self.publish(self.author, 2)
+        Timeline.objects.all().delete()
+        call_command('backfill_timelines', '--user', str(self.reader.pk),
+                     stdout=io.StringIO())
+        self.assertEqual(
+            set(Timeline.objects.filter(user=self.reader).values_list(
+                'recipe', flat=True)), set(published))
+
+
+class AsyncReadViewsTestCase(TestCase):
+    """Класс тестирования асинхронных представлений для чтения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора, рецепт с тегом и ингредиентом."""
+        cls.password = 'async-password'
+        cls.author = User.objects.create_user(
+            email='async@foodgram.ru', username='async',
+            first_name='Автор', last_name='Асинхронный',
+            password=cls.password)
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='Овсянка', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Сварить')
+        cls.recipe.tags.set([cls.tag])
+        IngredientInRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=50)
+
+    def setUp(self):
+        """Очищает кэш и создаёт клиент с токеном."""
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.author.email, 'password': self.password})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        self.guest_client = Client()
+
+    def get_both(self, client, url, params=None):
+        """Запрашивает url через синхронные и асинхронные эндпоинты."""
+        cache.clear()
+        sync_response = client.get(url, params)
+        cache.clear()
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            async_response = client.get(url, params)
+        return sync_response, async_response
+
+    def test_responses_match_sync_views(self):
+        """Асинхронные представления отвечают так же, как вьюсеты."""
+        for url, params in (
+                ('/api/recipes/', None),
+                ('/api/recipes/', {'tags': 'breakfast', 'limit': 1}),
+                ('/api/recipes/', {'cursor': ''}),
+                (f'/api/recipes/{self.recipe.pk}/', None),
+                ('/api/recipes/0/', None),
+                ('/api/tags/', None),
+                (f'/api/tags/{self.tag.pk}/', None),
+                ('/api/tags/0/', None),
+                ('/api/ingredients/', None),
+                ('/api/ingredients/', {'name': 'овс'}),
+                (f'/api/ingredients/{self.ingredient.pk}/', None)):
+            for client in (self.client, self.guest_client):
+                with self.subTest(url=url, params=params, client=client):
+                    sync_response, async_response = self.get_both(
+                        client, url, params)
+                    self.assertEqual(
+                        async_response.status_code,
+                        sync_response.status_code)
+                    self.assertEqual(
+                        async_response.json(), sync_response.json())
+
+    def test_errors(self):
+        """Ошибки фильтров и аутентификации отдаются в формате DRF."""
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            response = self.client.get(
+                '/api/recipes/', {'search_mode': 'regex'})
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            self.assertIn('search_mode', response.json())
+            response = self.guest_client.get(
+                '/api/tags/', HTTP_AUTHORIZATION='Token invalid')
+            self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+            self.assertEqual(response['WWW-Authenticate'], 'Token')
+            response = self.client.post('/api/tags/')
+            self.assertEqual(
+                response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_anonymous_cache(self):
+        """Ответы анонимам кэшируются в том же кэше."""
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            first = self.guest_client.get('/api/recipes/')
+            second = self.guest_client.get('/api/recipes/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+
+    def test_writes_use_sync_views(self):
+        """Запись под ASGI обслуживают синхронные вьюсеты."""
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {'name': 'Овсяная каша', 'tags': [self.tag.pk],
+                 'ingredients': [{'id': self.ingredient.pk, 'amount': 60}]},
+                format='json')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            response = self.guest_client.post('/api/recipes/', {})
+            self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Овсяная каша')
+
+    def test_options_use_sync_views(self):
+        """OPTIONS под ASGI отвечает так же, как синхронные вьюсеты."""
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipe.pk}/',
+                    '/api/tags/', f'/api/tags/{self.tag.pk}/',
+                    '/api/ingredients/'):
+            with self.subTest(url=url):
+                sync_response = self.client.options(url)
+                with override_settings(
+                        ROOT_URLCONF='foodgram.urls_async'):
+                    async_response = self.client.options(url)
+                self.assertEqual(
+                    async_response.status_code, sync_response.status_code)
+                self.assertEqual(
+                    async_response.json(), sync_response.json())
+
+    def test_short_link_redirect(self):
+        """Короткая ссылка редиректит на рецепт."""
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            response = self.guest_client.get(
+                f'/s/{encode_recipe_id(self.recipe.pk)}')
+            missing = [
+                self.guest_client.get('/s/abc'),
+                self.guest_client.get(
+                    f'/s/{encode_recipe_id(self.recipe.pk + 1)}')]
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{self.recipe.pk}/',
+            fetch_redirect_response=False)
+        for response in missing:
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FakeConnection:
+    """Соединение DB-API для тестов пула."""
+
+    def __init__(self):
+        """Открытое соединение без транзакции."""
+        self.closed = 0
+        self.rollbacks = 0
+
+    def rollback(self):
+        """Считает откаты."""
+        self.rollbacks += 1
+
+    def close(self):
+        """Закрывает соединение."""
+        self.closed = 1
+
+
+class ConnectionPoolTestCase(TestCase):
+    """Тесты пула соединений foodgram.db.pool."""
+
+    def setUp(self):
+        """Пул на одно соединение и одно временное."""
+        self.pool = ConnectionPool(max_size=1, max_overflow=1, timeout=0.05)
+
+    def test_connection_is_reused(self):
+        """Возвращённое соединение выдаётся повторно после отката."""
+        connection = self.pool.acquire(FakeConnection)
+        self.pool.release(connection)
+        self.assertIs(self.pool.acquire(FakeConnection), connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(self.pool.stats(), {
+            'size': 1, 'idle': 0, 'checked_out': 1, 'waiting': 0,
+            'created': 1, 'closed': 0, 'timeouts': 0})
+
+    def test_overflow_and_timeout(self):
+        """Временное соединение закрывается, сверх лимита — ожидание."""
+        first = self.pool.acquire(FakeConnection)
+        second = self.pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(FakeConnection)
+        self.pool.release(first)
+        self.pool.release(second)
+        self.assertTrue(second.closed)
+        self.assertFalse(first.closed)
+        stats = self.pool.stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['timeouts']),
+                         (1, 1, 1))
+
+    def test_waiting_for_release(self):
+        """Ожидающий поток получает освобождённое соединение."""
+        self.pool.timeout = 5
+        connections = [self.pool.acquire(FakeConnection) for _ in range(2)]
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(
+                self.pool.acquire(FakeConnection)))
+        waiter.start()
+        while not self.pool.stats()['waiting']:
+            pass
+        self.pool.release(connections[0])
+        waiter.join()
+        self.assertEqual(acquired, connections[:1])
+
+    def test_closed_and_expired_connections_are_replaced(self):
+        """Закрытые и устаревшие соединения не выдаются."""
+        connection = self.pool.acquire(FakeConnection)
+        self.pool.release(connection)
+        connection.close()
+        self.assertIsNot(self.pool.acquire(FakeConnection), connection)
+        self.pool.max_lifetime = 0
+        fresh = self.pool.acquire(FakeConnection)
+        self.pool.release(fresh)
+        self.assertTrue(fresh.closed)
+        self.assertEqual(self.pool.stats()['closed'], 2)
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'Нужна БД replica: --settings=foodgram.settings_test_replicas')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(TestCase):
+    """Класс тестирования чтения с реплики.
+
+    Данные создаются только в default, реплика пуста: так видно,
+    из какой БД прочитан ответ.
+    """
+
+    # Без БД replica класс пропускается, но databases проверяется всегда.
+    databases = {'default'} | ({'replica'} & set(settings.DATABASES))
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт пользователя с токеном, тег и рецепт в default."""
+        cls.user = User.objects.create_user(
+            email='writer@foodgram.ru', username='writer',
+            first_name='Имя', last_name='Фамилия', password='writer-pass')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Каша', text='Текст')
+
+    def setUp(self):
+        """Очищает кэш и создаёт клиент с токеном."""
+        cache.clear()
+        token_cache.clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_safe_requests_read_from_replica(self):
+        """GET читает с реплики, аутентификация — из default."""
+        self.assertEqual(self.client.get('/api/tags/').json(), [])
+        self.assertEqual(
+            APIClient().get(f'/api/tags/{self.tag.pk}/').status_code,
+            HTTPStatus.NOT_FOUND)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После записи клиент читает из default, другие — с реплики."""
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(len(self.client.get('/api/tags/').json()), 1)
+        self.assertEqual(APIClient().get('/api/tags/').json(), [])
+        cache.clear()
+        self.assertEqual(self.client.get('/api/tags/').json(), [])
+
+    def test_failed_write_does_not_stick(self):
+        """Неудачная запись не переключает клиента на default."""
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk + 1}/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get('/api/tags/').json(), [])
+
+    def test_first_read_after_login(self):
+        """Первый GET с новым токеном читает из default."""
+        client = APIClient()
+        response = client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': 'writer-pass'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        response = client.get('/api/users/me/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data['id'], self.user.pk)
+        self.assertEqual(len(client.get('/api/tags/').json()), 1)
+
+    def test_anonymous_cache_is_filled_from_primary(self):
+        """Кэш ответов для анонимов заполняется из default."""
+        response = APIClient().get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_use_primary(self):
+        """use_primary отменяет чтение с реплики внутри блока."""
+        with use_replicas():
+            self.assertFalse(Tag.objects.exists())
+            with use_primary():
+                self.assertTrue(Tag.objects.exists())
+        self.assertTrue(Tag.objects.exists())
+
+
+class FastJSONTestCase(TestCase):
+    """Класс тестирования рендерера и парсера JSON на orjson."""
+
+    data = {
+        'decimal': Decimal('1.50'),
+        'datetime': datetime(2024, 5, 1, 12, 30, 15, 123456,
+                             tzinfo=timezone.utc),
+        'date': date(2024, 5, 1),
+        'lazy': gettext_lazy('Not found.'),
+        'detail': ErrorDetail('Ошибка', code='invalid'),
+        'text': 'строка\u2028с разделителем',
+        1: [None, True, 1.5, ('a', 'b')],
+    }
+
+    def test_render_matches_json_renderer(self):
+        """Ответ совпадает с JSONRenderer, в том числе без orjson."""
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONRenderer().render(self.data), expected)
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(
+            FastJSONRenderer().render({'big': 2 ** 70}),
+            JSONRenderer().render({'big': 2 ** 70}))
+
+    def test_render_indent(self):
+        """С отступом используется JSONRenderer."""
+        self.assertEqual(
+            FastJSONRenderer().render(
+                self.data, 'application/json; indent=4'),
+            JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    def test_parse(self):
+        """Парсер разбирает JSON и отклоняет некорректный."""
+        parser = FastJSONParser()
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"name": "Суп"}'.encode())),
+            {'name': 'Суп'})
+        for body in (b'{"name": ', b'{"amount": NaN}'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
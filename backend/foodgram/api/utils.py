@@ -1,21 +1,247 @@
 """Вспомогательные функции приложения api."""
 import csv
+import json
+from itertools import islice
 
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.response import Response
 
+from foodgram.constants import (
+    PANTRY_SEARCH_LIMIT, PANTRY_SEARCH_MAX_LIMIT, SHOPPING_CART_CHUNK_SIZE)
 
-def get_report_response(ingredients):
+SHOPPING_CART_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+def get_recipes_limit(request):
+    """Возвращает значение параметра recipes_limit или None."""
+    try:
+        return max(int(request.query_params['recipes_limit']), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+def get_pantry_params(request):
+    """Возвращает id ингредиентов и limit для подбора по ингредиентам.
+
+    При некорректном id возвращается пустое множество.
+    """
+    try:
+        ingredient_ids = {
+            int(pk)
+            for value in request.query_params.getlist('ingredients')
+            for pk in value.split(',') if pk.strip()}
+    except ValueError:
+        ingredient_ids = set()
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        limit = PANTRY_SEARCH_LIMIT
+    return ingredient_ids, min(max(limit, 1), PANTRY_SEARCH_MAX_LIMIT)
+
+
+def get_membership_error(model, pk, message):
+    """Ответ на неудачное добавление или удаление связи.
+
+    Вызывается, когда запрос не затронул ни одной строки: 404, если
+    объекта нет, иначе 400 с сообщением.
+    """
+    if not model.objects.filter(pk=pk).exists():
+        raise Http404
+    return Response({'errors': message}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        """Возвращает переданную строку."""
+        return value
+
+
+class ShoppingCartWriter:
+    """Базовый класс выгрузки корзины покупок.
+
+    Наследники отдают выгрузку по частям: заголовок, по строке
+    на каждый ингредиент и завершение, не накапливая её в памяти.
+    """
+
+    content_type = None
+    extension = None
+
+    def header(self):
+        """Возвращает начало выгрузки."""
+        return ''
+
+    def row(self, ingredient):
+        """Возвращает строку выгрузки для одного ингредиента."""
+        raise NotImplementedError
+
+    def footer(self):
+        """Возвращает конец выгрузки."""
+        return ''
+
+    def stream(self, ingredients):
+        """Генерирует выгрузку по мере чтения ингредиентов."""
+        yield self.header()
+        for ingredient in ingredients:
+            yield self.row(ingredient)
+        yield self.footer()
+
+
+class CsvShoppingCartWriter(ShoppingCartWriter):
+    """Выгрузка корзины покупок в csv."""
+
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self):
+        """Создаёт csv.writer поверх псевдобуфера."""
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        """Возвращает строку заголовков."""
+        return self.writer.writerow(SHOPPING_CART_HEADER)
+
+    def row(self, ingredient):
+        """Возвращает csv строку ингредиента."""
+        return self.writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['amount']))
+
+
+class TxtShoppingCartWriter(ShoppingCartWriter):
+    """Выгрузка корзины покупок текстовым списком."""
+
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def header(self):
+        """Возвращает заголовок списка."""
+        return 'Список покупок:\n'
+
+    def row(self, ingredient):
+        """Возвращает пункт списка."""
+        return (f'- {ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]}) '
+                f'— {ingredient["amount"]}\n')
+
+
+class JsonShoppingCartWriter(ShoppingCartWriter):
+    """Выгрузка корзины покупок в json."""
+
+    content_type = 'application/json'
+    extension = 'json'
+
+    def __init__(self):
+        """Запоминает, нужен ли разделитель перед следующим объектом."""
+        self.separator = ''
+
+    def header(self):
+        """Открывает массив."""
+        return '['
+
+    def row(self, ingredient):
+        """Возвращает объект ингредиента."""
+        row = self.separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['amount'],
+        }, ensure_ascii=False)
+        self.separator = ','
+        return row
+
+    def footer(self):
+        """Закрывает массив."""
+        return ']'
+
+
+SHOPPING_CART_WRITERS = {
+    writer.extension: writer
+    for writer in (
+        CsvShoppingCartWriter,
+        TxtShoppingCartWriter,
+        JsonShoppingCartWriter)
+}
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Не сопоставляет параметр format с рендерерами DRF.
+
+    В выгрузке параметр format выбирает класс выгрузки, а сообщения
+    об ошибках отдаются первым рендерером.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        """Возвращает первый рендерер."""
+        return renderers[0], renderers[0].media_type
+
+
+def iterate_in_transaction(queryset, chunk_size):
+    """Читает кверисет серверным курсором, за pgbouncer — в транзакции.
+
+    Потоковый ответ читается после выхода из представления, в режиме
+    autocommit, где Django открывает курсор WITH HOLD. За pgbouncer
+    в режиме transaction такой курсор может оказаться на другом
+    серверном соединении, а внутри транзакции соединение закреплено
+    за клиентом до её конца. Без pgbouncer транзакция не открывается:
+    она держала бы соединение из пула, пока клиент скачивает ответ.
+    """
+    settings_dict = connections[queryset.db].settings_dict
+    if not settings_dict.get('PGBOUNCER_TRANSACTION_MODE'):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    with transaction.atomic(using=queryset.db):
+        yield from queryset.iterator(chunk_size=chunk_size)
+
+
+class AsyncStream:
+    """Асинхронная обёртка синхронного потока для ASGI.
+
+    Под ASGI StreamingHttpResponse в Django 4.2 читает синхронный
+    итератор целиком через sync_to_async(list) и только потом отправляет
+    первый байт. Обёртка читает по chunk_size частей за вызов
+    sync_to_async. Вызовы идут в поток запроса (thread_sensitive),
+    поэтому транзакция и курсор остаются на одном соединении.
+    close() вызывается из response.close() в том же потоке.
+    """
+
+    def __init__(self, iterator, chunk_size):
+        """Запоминает исходный итератор."""
+        self.iterator = iterator
+        self.chunk_size = chunk_size
+
+    def next_chunk(self):
+        """Читает следующие chunk_size частей."""
+        return list(islice(self.iterator, self.chunk_size))
+
+    async def __aiter__(self):
+        """Отдаёт части по мере чтения."""
+        next_chunk = sync_to_async(self.next_chunk)
+        while chunk := await next_chunk():
+            for part in chunk:
+                yield part
+
+    def close(self):
+        """Закрывает исходный итератор, завершая его транзакцию."""
+        if hasattr(self.iterator, 'close'):
+            self.iterator.close()
+
+
+def get_report_response(request, ingredients, export_format):
     """Вспомогательная функция для выдачи корзины покупок."""
-    shopping_cart = [(
-        i["ingredient__name"],
-        i["ingredient__measurement_unit"],
-        i["amount"],
-        i["recipe__name"]) for i in ingredients
-    ]
-    response = HttpResponse(content_type='text/csv')
-    writer = csv.writer(response)
-    writer.writerow(
-        ['Ингредиент', 'Единица измерения',
-            'Количество', 'Рецепт'])
-    writer.writerows(shopping_cart)
+    writer = SHOPPING_CART_WRITERS[export_format]()
+    content = writer.stream(ingredients)
+    if isinstance(request, ASGIRequest):
+        content = AsyncStream(content, SHOPPING_CART_CHUNK_SIZE)
+    response = StreamingHttpResponse(
+        content,
+        content_type=writer.content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{writer.extension}"')
     return response
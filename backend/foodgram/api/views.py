@@ -1,13 +1,17 @@
 """Представления api проекта foodgram."""
-from django.db.models import Sum
+from functools import partial
+
+from django.db import transaction
+from django.db.models import (
+    Exists, F, OuterRef, Prefetch, Sum, Value, Window)
+from django.db.models.functions import RowNumber
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
 from django.views import View
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticatedOrReadOnly,
@@ -15,15 +19,30 @@ from rest_framework.permissions import (
     SAFE_METHODS)
 from rest_framework.response import Response
 
-from .utils import get_report_response
+from .cache import AnonymousCacheMixin
+from .feed import backfill, get_feed_sources, unfollow
+from .links import encode_recipe_id, resolve_short_link
+from .memberships import add_membership, remove_membership
+from .pantry import pantry_index
+from .search import ingredient_index
+from .utils import (
+    SHOPPING_CART_WRITERS,
+    ExportContentNegotiation,
+    get_membership_error,
+    get_pantry_params,
+    get_recipes_limit,
+    get_report_response,
+    iterate_in_transaction)
+from foodgram.constants import SHOPPING_CART_CHUNK_SIZE
 from recipes.models import (
     Favorite,
     Ingredient, IngredientInRecipe,
-    Recipe, RecipeLinks,
+    Recipe,
     ShoppingCart, Tag)
-from users.models import User
+from users.models import Subscribe, User
 from .filters import IngredientFilter, RecipeFilter
-from .paginations import RecipePagination
+from .paginations import (
+    CachedCountLimitOffsetPagination, FeedPagination, RecipePagination)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     AvatarSerializer,
@@ -43,7 +62,8 @@ class CustomUserViewSet(UserViewSet):
     """Представление эндпоинта users."""
 
     queryset = User.objects.all()
-    pagination_class = LimitOffsetPagination
+    lookup_value_regex = r'\d+'
+    pagination_class = CachedCountLimitOffsetPagination
     permission_classes = [IsAuthenticatedOrReadOnly, ]
 
     def get_serializer_class(self):
@@ -99,11 +119,31 @@ class CustomUserViewSet(UserViewSet):
     @action(
         detail=False,
         url_path='subscriptions',
+        permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        """Определяет поведение при GET запросе к /subscriptions."""
+        """Определяет поведение при GET запросе к /subscriptions.
+
+        Число рецептов автора хранится в User.recipes_count, а первые
+        recipes_limit рецептов всех авторов страницы выбираются одним
+        запросом с ROW_NUMBER() OVER (PARTITION BY author).
+        """
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'cooking_time')
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=(F('pub_date').desc(), F('id').desc()))
+            ).filter(row_number__lte=recipes_limit)
         queryset = User.objects.filter(
-            subscribed_author__user=request.user)
+            subscribed_author__user=request.user
+        ).annotate(
+            is_subscribed=Value(True)
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview'))
         paginated_queryset = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             paginated_queryset,
@@ -116,30 +156,36 @@ class CustomUserViewSet(UserViewSet):
         methods=['post', 'delete'],
         url_path='subscribe'
     )
+    @transaction.atomic
     def subscribe(self, request, id=None):
-        """Определяет поведение при POST/DELETE запросах к /subscribe."""
-        author = get_object_or_404(User, pk=id)
-        user = self.request.user
-        serializer = SubscribeSerializer(
-            author,
-            data={'user': user},
-            context={
-                'request': request,
-                'author': author}
-        )
-        serializer.is_valid(raise_exception=True)
+        """Определяет поведение при POST/DELETE запросах к /subscribe.
+
+        Подписка добавляется и удаляется одним запросом к БД
+        (api.memberships), наличие автора проверяется только при
+        неудаче, чтобы отличить 404 от 400.
+        """
         if request.method == 'POST':
-            serializer.create(validated_data={'author': author, 'user': user})
-            serializer.save()
+            if request.user.pk == int(id):
+                return Response(
+                    {'errors': 'Нельзя подписаться на самого себя!'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            author = add_membership(Subscribe, request.user, id)
+            if author is None:
+                return get_membership_error(
+                    User, id, 'Вы уже подписаны на этого автора!')
+            author.is_subscribed = True
+            transaction.on_commit(partial(
+                backfill, [(request.user.pk, author.pk)]))
+            serializer = SubscribeSerializer(
+                author, context={'request': request})
             return Response(serializer.data,
                             status=status.HTTP_201_CREATED)
-
-        if request.method == 'DELETE':
-            user.follower.filter(
-                author=author
-            ).delete()
-            return Response(
-                status=status.HTTP_204_NO_CONTENT)
+        if not remove_membership(Subscribe, request.user, id):
+            return get_membership_error(
+                User, id, 'Вы не подписаны на этого автора!')
+        unfollow(request.user.pk, id)
+        return Response(
+            status=status.HTTP_204_NO_CONTENT)
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -151,18 +197,54 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def get_recipe_queryset(queryset, user):
+    """Собирает кверисет рецептов для ReadRecipeSerializer.
+
+    Связанные объекты подгружаются через select_related/Prefetch,
+    а флаги is_favorited, is_in_shopping_cart и is_subscribed
+    вычисляются аннотациями Exists, поэтому страница ленты любого
+    размера обходится фиксированным числом запросов.
+    """
+    queryset = queryset.prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe',
+            queryset=IngredientInRecipe.objects.select_related(
+                'ingredient')))
+    if user.is_anonymous:
+        return queryset.select_related('author').annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False))
+    authors = User.objects.annotate(
+        is_subscribed=Exists(Subscribe.objects.filter(
+            user=user, author=OuterRef('pk'))))
+    return queryset.prefetch_related(
+        Prefetch('author', queryset=authors)
+    ).annotate(
+        is_favorited=Exists(Favorite.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+        is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
+
+
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """Представление для эндпоинта recipes."""
 
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = [IsAuthorOrReadOnly]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = RecipePagination
 
+    def get_queryset(self):
+        """Собирает кверисет рецептов для ReadRecipeSerializer."""
+        return get_recipe_queryset(
+            super().get_queryset(), self.request.user)
+
     def get_serializer_class(self):
         """Определяет класс сериализатора в зависимости от метода запроса."""
-        if self.action in SAFE_METHODS:
+        if self.request.method in SAFE_METHODS:
             return ReadRecipeSerializer
         return CreateRecipeSerializer
 
@@ -176,58 +258,149 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[],
     )
     def get_link(self, request, pk=None):
-        """Определяет поведение при GET запросе к /get-link."""
-        links = get_object_or_404(RecipeLinks, recipe_id=pk)
-        if links:
-            return JsonResponse(
-                {'short-link': request.build_absolute_uri(
-                    f'/s/{links.short_link}')})
+        """Определяет поведение при GET запросе к /get-link.
+
+        Код ссылки вычисляется из id рецепта, без таблицы ссылок.
+        """
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise Http404('Рецепт не найден.')
         return JsonResponse(
-            {'detail': f'Рецепт с ID {pk} не найден.'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+            {'short-link': request.build_absolute_uri(
+                f'/s/{encode_recipe_id(int(pk))}')})
+
+    @action(
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Определяет поведение при GET запросе к /feed.
+
+        Рецепты авторов из подписок читаются из ленты Timeline
+        и рецептов авторов с fan-out на чтение (api.feed), курсорной
+        пагинацией по ключу (pub_date, id).
+        """
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_sources(
+            get_feed_sources(request.user), request)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = ReadRecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        url_path='similar',
+        permission_classes=(AllowAny,),
+    )
+    def similar(self, request, pk=None):
+        """Определяет поведение при GET запросе к /similar.
+
+        Похожие рецепты заранее рассчитаны командой
+        build_similar_recipes и читаются из SimilarRecipe одним
+        запросом (плюс подгрузка тегов и ингредиентов).
+        """
+        recipes = list(self.get_queryset().filter(
+            similar_to__recipe_id=pk).annotate(
+                similarity=F('similar_to__score')).order_by(
+                    '-similarity', '-id'))
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        serializer = ReadRecipeSerializer(
+            recipes,
+            many=True,
+            context={'request': request})
+        return Response([
+            {**data, 'similarity': round(recipe.similarity, 4)}
+            for data, recipe in zip(serializer.data, recipes)])
+
+    @action(
+        detail=False,
+        url_path='pantry',
+        permission_classes=(AllowAny,),
+    )
+    def pantry(self, request):
+        """Определяет поведение при GET запросе к /pantry.
+
+        Подбирает рецепты по ингредиентам из параметра ingredients
+        (id через запятую или повторяющимся параметром) по индексу
+        в памяти (api.pantry); из БД читаются только limit лучших
+        рецептов.
+        """
+        ingredient_ids, limit = get_pantry_params(request)
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': 'Укажите id ингредиентов через запятую.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        scores = pantry_index.search(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, *_ in scores])
+        found = [(recipes[recipe_id], matched, missing)
+                 for recipe_id, matched, missing in scores
+                 if recipe_id in recipes]
+        serializer = ReadRecipeSerializer(
+            [recipe for recipe, *_ in found],
+            many=True,
+            context={'request': request})
+        return Response([
+            {**data,
+             'matched_ingredients': matched,
+             'missing_ingredients': missing,
+             'coverage': round(matched / (matched + missing), 4)}
+            for data, (_, matched, missing) in zip(serializer.data, found)])
 
     @action(detail=False,
-            url_path='download_shopping_cart')
+            url_path='download_shopping_cart',
+            permission_classes=(IsAuthenticated,),
+            content_negotiation_class=ExportContentNegotiation)
     def download_shopping_cart(self, request):
-        """Определяет поведение при GET запросе к /download_shopping_cart."""
+        """Определяет поведение при GET запросе к /download_shopping_cart.
+
+        Ингредиенты суммируются по названию и единице измерения и читаются
+        курсором по частям, а ответ отдаётся потоком в формате из
+        параметра format (csv, txt или json), под ASGI — асинхронным.
+        """
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in SHOPPING_CART_WRITERS:
+            return Response(
+                {'errors': 'Доступные форматы: '
+                 f'{", ".join(SHOPPING_CART_WRITERS)}'},
+                status=status.HTTP_400_BAD_REQUEST)
         ingredients = IngredientInRecipe.objects.filter(
             recipe__shopping_cart__user=request.user).values(
                 'ingredient__name',
-                'ingredient__measurement_unit',
-                'recipe__name').annotate(
-                amount=Sum('amount')).order_by('recipe__name')
-        return get_report_response(ingredients)
+                'ingredient__measurement_unit').annotate(
+                amount=Sum('amount')).order_by(
+                    'ingredient__name', 'ingredient__measurement_unit')
+        return get_report_response(
+            request._request,
+            iterate_in_transaction(ingredients, SHOPPING_CART_CHUNK_SIZE),
+            export_format)
 
+    @transaction.atomic
     def to_create_delete(self, request, model, pk=None):
-        """Вспомогательная DRY функция для shopping_cart и favorite."""
-        recipe = get_object_or_404(Recipe, id=pk)
+        """Вспомогательная DRY функция для shopping_cart и favorite.
+
+        Рецепт добавляется и удаляется одним запросом к БД
+        (api.memberships), наличие рецепта проверяется только при
+        неудаче, чтобы отличить 404 от 400.
+        """
         if request.method == 'POST':
+            recipe = add_membership(model, request.user, pk)
+            if recipe is None:
+                return get_membership_error(
+                    Recipe, pk, 'Рецепт уже добавлен.')
             serializer = ShoppingCartAndFavoriteSerializer(
                 recipe,
-                data=request.data
-            )
-            serializer.is_valid(raise_exception=True)
-            if model.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            model.objects.create(user=request.user, recipe=recipe)
-            modified_data = {
-                **serializer.data,
-                'image': request.build_absolute_uri(
-                    recipe.image.url
-                )
-            }
-            return Response(modified_data, status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE':
-            object = get_object_or_404(
-                model,
-                user=request.user,
-                recipe=recipe
+                context={'request': request}
             )
-            object.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not remove_membership(model, request.user, pk):
+            return get_membership_error(
+                Recipe, pk, 'Рецепт не был добавлен.')
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
@@ -261,6 +434,13 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        """Отвечает на поиск по названию из индекса без запросов к БД."""
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
+
 
 class RedirectShortLink(View):
     """Представление для редиректа ссылок."""
@@ -268,11 +448,11 @@ class RedirectShortLink(View):
     permission_classes = []
 
     def get(self, request, short_link):
-        """Получает пороткую ссылку из БД и редиректит на полную."""
-        link = get_object_or_404(
-            RecipeLinks,
-            short_link=short_link
-        )
+        """Раскодирует короткую ссылку в id рецепта и редиректит на полную."""
+        recipe_id = resolve_short_link(short_link)
+        if (recipe_id is None
+                or not Recipe.objects.filter(pk=recipe_id).exists()):
+            raise Http404('Ссылка не найдена.')
         return redirect(
             request.build_absolute_uri(
-                f'/recipes/{link.recipe_id}/'))
+                f'/recipes/{recipe_id}/'))
@@ -3,6 +3,12 @@ ASGI config for foodgram project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Под ASGI используются эндпоинты foodgram.urls_async: чтение публичного
+API обслуживают асинхронные представления, запись — синхронные.
+Соединения с БД берутся из пула (DB_POOL_MAX_SIZE): у каждого запроса
+свой поток, и без пула соединение открывалось бы на каждый запрос.
+Запуск: gunicorn foodgram.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -12,5 +18,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ROOT_URLCONF', 'foodgram.urls_async')
+os.environ.setdefault('DB_POOL_MAX_SIZE', '10')
 
 application = get_asgi_application()
@@ -12,12 +12,40 @@ MAX_INGREDIENT_NAME_LENGHT = 128
 MAX_INGREDIENT_MEASUREMENT_UNIT_LENGHT = 64
 MAX_TAG_NAME_LENGHT = 32
 MAX_RECIPELINKS_SHORTLINK_LENGHT = 5
+SHORT_LINK_LENGTH = 6
 MAX_RECIPE_PER_PAGE = 6
 USERNAME_PATTERN = r'^[\w.@+-]+\Z'
 PAGINATION_PAGE_SIZE = 10
+RECIPE_CACHE_TIMEOUT = 60 * 5
+COUNT_CACHE_TIMEOUT = 60
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+AUTH_TOKEN_LOCAL_TIMEOUT = 10
+AUTH_TOKEN_LOCAL_MAX_SIZE = 10000
+APPROXIMATE_COUNT_THRESHOLD = 100000
+INGREDIENT_SEARCH_LIMIT = 50
+PANTRY_SEARCH_LIMIT = 20
+PANTRY_SEARCH_MAX_LIMIT = 100
+PANTRY_CHANGE_TIMEOUT = 60 * 60
+PANTRY_MAX_REPLAY = 1000
+PANTRY_CHUNK_SIZE = 10000
+SIMILAR_RECIPES_TOP = 10
+SIMILAR_MAX_FREQUENCY = 0.2
+SIMILAR_MIN_FREQUENCY_LIMIT = 1000
+SIMILAR_CHUNK_SIZE = 1000
+FEED_TIMELINE_LENGTH = 500
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_BATCH_SIZE = 100
+SHOPPING_CART_CHUNK_SIZE = 500
+REPLICA_STICKY_TIMEOUT = 10
+DATA_LOAD_BATCH_SIZE = 1000
 TAG_SLUG_REGEX = '^[-a-zA-Z0-9_]+$'
 BASE_DIR = Path(__file__).resolve().parent.parent
 CSV_FOLDER_PATH = os.path.join(BASE_DIR, 'media\\shopping_carts')
+SEARCH_MODE_CHOICES = (
+    ('fts', 'fts'),
+    ('trigram', 'trigram'),
+)
 RECIPE_STATUS_CHOICES = (
     (0, 'not_is_in'),
     (1, 'is_in'),
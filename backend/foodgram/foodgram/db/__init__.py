@@ -0,0 +1 @@
+"""Бэкенд PostgreSQL проекта foodgram: пул соединений и pgbouncer."""
@@ -0,0 +1,59 @@
+"""PostgreSQL с пулом соединений и поддержкой pgbouncer.
+
+Дополнительные ключи DATABASES:
+POOL — параметры ConnectionPool (max_size, max_overflow, timeout,
+max_lifetime, check) или None: тогда, как в стандартном бэкенде,
+каждое подключение Django открывает своё соединение;
+PGBOUNCER_TRANSACTION_MODE — БД за pgbouncer с pool_mode = transaction.
+Между транзакциями pgbouncer может отдать клиенту другое серверное
+соединение, и курсор WITH HOLD, который Django открывает для
+iterator() вне транзакции, на нём не существует. В этом режиме
+iterator() вне транзакции читает обычным курсором, а внутри
+транзакции — серверным курсором без WITH HOLD.
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Берёт соединения из пула и возвращает их туда при закрытии."""
+
+    def get_pool(self):
+        """Пул соединений этой БД или None, если пул не настроен."""
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        return get_pool((self.alias, self.settings_dict['NAME']), options)
+
+    def get_new_connection(self, conn_params):
+        """Берёт соединение из пула или открывает новое."""
+        pool = self.get_pool()
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.acquire(
+            partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        """Возвращает соединение в пул.
+
+        Соединение, закрытое внутри atomic, закрывается по-настоящему:
+        Django продолжает считать его своим до выхода из блока.
+        """
+        pool = self.get_pool()
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                pool.discard(self.connection)
+            else:
+                pool.release(self.connection)
+
+    def chunked_cursor(self):
+        """Серверный курсор для iterator() с учётом pgbouncer."""
+        if (self.settings_dict.get('PGBOUNCER_TRANSACTION_MODE')
+                and self.get_autocommit()):
+            return self.cursor()
+        return super().chunked_cursor()
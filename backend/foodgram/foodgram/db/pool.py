@@ -0,0 +1,180 @@
+"""Пул соединений с БД внутри процесса.
+
+Django открывает соединение на поток, а под ASGI — на каждый запрос
+(у каждого запроса свой поток sync_to_async), поэтому постоянные
+соединения (CONN_MAX_AGE) там не переиспользуются. Пул отдаёт
+соединение при подключении Django и принимает его обратно при закрытии,
+и соединение живёт дольше запроса и потока.
+"""
+import threading
+import time
+from collections import deque
+
+from psycopg2 import Error, OperationalError
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Свободное соединение не появилось за timeout секунд."""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений DB-API.
+
+    Держит до max_size соединений, сверх них открывает до max_overflow
+    временных, которые закрываются при возврате. Когда заняты все,
+    acquire ждёт освобождения соединения не дольше timeout секунд.
+    Соединения старше max_lifetime секунд закрываются при возврате,
+    с check перед выдачей проверяется, что соединение живо (SELECT 1).
+    """
+
+    def __init__(self, max_size, max_overflow=0, timeout=30.0,
+                 max_lifetime=None, check=False):
+        """Создаёт пустой пул, соединения открываются по требованию."""
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.opened_at = {}
+        self.size = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.timeouts = 0
+
+    def take(self, deadline):
+        """Берёт свободное соединение или место под новое (None)."""
+        with self.condition:
+            while True:
+                if self.idle:
+                    self.checked_out += 1
+                    return self.idle.pop()
+                if self.size < self.max_size + self.max_overflow:
+                    self.size += 1
+                    self.checked_out += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'Нет свободного соединения за {self.timeout} с: '
+                        f'занято {self.checked_out}.')
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def is_usable(self, connection):
+        """Проверяет, что соединение открыто и, с check, отвечает."""
+        if connection.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Error:
+            return False
+        return True
+
+    def acquire(self, connect):
+        """Выдаёт соединение из пула или открывает новое через connect()."""
+        deadline = time.monotonic() + self.timeout
+        while (connection := self.take(deadline)) is not None:
+            if self.is_usable(connection):
+                return connection
+            self.discard(connection)
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.checked_out -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+            self.opened_at[connection] = time.monotonic()
+        return connection
+
+    def release(self, connection):
+        """Возвращает соединение в пул, откатив незавершённую транзакцию.
+
+        Временные, закрытые и устаревшие соединения закрываются.
+        """
+        expired = (
+            self.max_lifetime is not None
+            and time.monotonic() - self.opened_at.get(connection, 0)
+            >= self.max_lifetime)
+        if not expired and not connection.closed:
+            try:
+                connection.rollback()
+            except Error:
+                pass
+            else:
+                with self.condition:
+                    if len(self.idle) < self.max_size:
+                        self.checked_out -= 1
+                        self.idle.append(connection)
+                        self.condition.notify()
+                        return
+        self.discard(connection)
+
+    def discard(self, connection):
+        """Закрывает выданное соединение и освобождает его место."""
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self.condition:
+            self.opened_at.pop(connection, None)
+            self.size -= 1
+            self.checked_out -= 1
+            self.closed += 1
+            self.condition.notify()
+
+    def close(self):
+        """Закрывает свободные соединения пула."""
+        with self.condition:
+            idle = list(self.idle)
+            self.idle.clear()
+            self.checked_out += len(idle)
+        for connection in idle:
+            self.discard(connection)
+
+    def stats(self):
+        """Метрики пула."""
+        with self.condition:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'checked_out': self.checked_out,
+                'waiting': self.waiting,
+                'created': self.created,
+                'closed': self.closed,
+                'timeouts': self.timeouts,
+            }
+
+
+def get_pool(key, options):
+    """Возвращает пул по ключу, создавая его при первом обращении."""
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(**options)
+        return pools[key]
+
+
+def get_pool_stats():
+    """Метрики всех пулов процесса по ключу пула."""
+    with pools_lock:
+        items = list(pools.items())
+    return {
+        ':'.join(filter(None, map(str, key))): pool.stats()
+        for key, pool in items}
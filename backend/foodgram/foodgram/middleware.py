@@ -0,0 +1,249 @@
+"""Промежуточные слои проекта foodgram."""
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .constants import REPLICA_STICKY_TIMEOUT
+from .db.pool import get_pool_stats
+from .routers import use_replicas
+
+logger = logging.getLogger('foodgram.requests')
+
+IN_PLACEHOLDERS = re.compile(r'\((?:%s, )+%s\)')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_STICKY_KEY = 'db:sticky:{digest}'
+
+active_recorder = ContextVar('active_recorder', default=None)
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: считает запросы и время в БД."""
+
+    def __init__(self):
+        """Создаёт пустые счётчики."""
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Выполняет запрос и записывает его длительность и форму."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[IN_PLACEHOLDERS.sub('(%s, ...)', sql)] += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Передаёт запрос QueryRecorder текущего HTTP-запроса, если он есть."""
+    recorder = active_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection):
+    """Подключает record_query к соединению один раз."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """Подключает record_query к соединению любого потока.
+
+    Соединения Django свои у каждого потока, а под ASGI запросы к БД
+    выполняются в потоках sync_to_async, а не в потоке цикла событий.
+    QueryRecorder запроса record_query берёт из контекста, который
+    sync_to_async передаёт в эти потоки.
+    """
+    install_recorder(connection)
+
+
+@contextmanager
+def record_queries():
+    """Направляет запросы к БД в новый QueryRecorder внутри блока."""
+    for connection in connections.all():
+        install_recorder(connection)
+    recorder = QueryRecorder()
+    token = active_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        active_recorder.reset(token)
+
+
+class QueryTimingMiddleware:
+    """Замеряет время запроса, число запросов к БД и время в БД.
+
+    Метрики отдаются в заголовке Server-Timing и пишутся строкой JSON
+    в логгер foodgram.requests. Если один и тот же SQL (без учёта
+    параметров) выполнился больше REQUEST_TIMING_N_PLUS_ONE_THRESHOLD
+    раз, в лог пишется предупреждение о возможном N+1. Замеряется
+    доля запросов REQUEST_TIMING_SAMPLE_RATE, остальные проходят без
+    обёрток. Запросы, выполненные при отдаче потокового ответа,
+    не учитываются. Если настроен пул соединений, в лог добавляются
+    его метрики (foodgram.db.pool). Поддерживает и WSGI, и ASGI без
+    переключения в синхронный режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Сохраняет следующий обработчик.
+
+        Соединения, открытые до загрузки middleware, сигнал
+        connection_created уже не увидит.
+        """
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all():
+            install_recorder(connection)
+
+    def __call__(self, request):
+        """Обрабатывает запрос с замером, если он попал в выборку."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        """Асинхронный вариант __call__ для ASGI."""
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, started)
+
+    def report(self, request, response, recorder, started):
+        """Добавляет Server-Timing и пишет метрики запроса в лог."""
+        total = (time.perf_counter() - started) * 1000
+        db = recorder.duration * 1000
+        response['Server-Timing'] = (
+            f'total;dur={total:.1f}, app;dur={total - db:.1f}, '
+            f'db;dur={db:.1f};desc="{recorder.count} queries"')
+        metrics = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total, 1),
+            'db_ms': round(db, 1),
+            'queries': recorder.count,
+        }
+        pools = get_pool_stats()
+        if pools:
+            metrics['db_pools'] = pools
+        logger.info(json.dumps(metrics))
+        self.report_repeated_queries(request, recorder)
+        return response
+
+    def report_repeated_queries(self, request, recorder):
+        """Пишет предупреждение о повторяющихся запросах."""
+        threshold = settings.REQUEST_TIMING_N_PLUS_ONE_THRESHOLD
+        for sql, count in recorder.shapes.most_common():
+            if count <= threshold:
+                break
+            logger.warning(json.dumps({
+                'event': 'n_plus_one',
+                'method': request.method,
+                'path': request.path,
+                'count': count,
+                'sql': sql,
+            }, ensure_ascii=False))
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплик БД (foodgram.routers) на время запроса.
+
+    Клиент определяется по заголовку Authorization или cookie сессии.
+    После успешного запроса на запись клиент REPLICA_STICKY_TIMEOUT
+    секунд читает из default и сразу видит свои изменения, неудачная
+    запись (ответ 4xx, 5xx) этого не включает. Вход в систему закрепляет
+    за default и выданный токен. Анонимные запросы без сессии читают
+    с реплик всегда.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Сохраняет следующий обработчик."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def make_sticky_key(self, credentials):
+        """Ключ кэша клиента по его учётным данным."""
+        return REPLICA_STICKY_KEY.format(
+            digest=hashlib.sha256(credentials.encode()).hexdigest())
+
+    def get_sticky_key(self, request):
+        """Ключ кэша клиента или None для анонима без сессии."""
+        credentials = request.META.get('HTTP_AUTHORIZATION') or (
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not credentials:
+            return None
+        return self.make_sticky_key(credentials)
+
+    def get_written_keys(self, request, response):
+        """Ключи клиентов, которые после записи читают из default."""
+        if response.status_code >= 400:
+            return {}
+        keys = {self.get_sticky_key(request)}
+        data = getattr(response, 'data', None)
+        if isinstance(data, dict) and 'auth_token' in data:
+            keys.add(self.make_sticky_key(f'Token {data["auth_token"]}'))
+        return dict.fromkeys(keys - {None}, True)
+
+    def __call__(self, request):
+        """Обрабатывает запрос с чтением с реплик, если оно разрешено."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            cache.set_many(
+                self.get_written_keys(request, response),
+                REPLICA_STICKY_TIMEOUT)
+            return response
+        sticky_key = self.get_sticky_key(request)
+        with use_replicas(sticky_key is None or not cache.get(sticky_key)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        """Асинхронный вариант __call__ для ASGI."""
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            await cache.aset_many(
+                self.get_written_keys(request, response),
+                REPLICA_STICKY_TIMEOUT)
+            return response
+        sticky_key = self.get_sticky_key(request)
+        with use_replicas(
+                sticky_key is None or not await cache.aget(sticky_key)):
+            return await self.get_response(request)
@@ -0,0 +1,55 @@
+"""Маршрутизация чтения на реплики БД.
+
+ReplicaRoutingMiddleware разрешает чтение с реплик на время запроса
+безопасным методом (GET, HEAD, OPTIONS), если клиент не писал в БД
+последние REPLICA_STICKY_TIMEOUT секунд: иначе реплика могла ещё
+не получить его изменения. Запись и остальные чтения идут в default.
+Данные, которые переживают запрос (кэш ответов, индексы в памяти,
+кэш токенов), читаются из default внутри use_primary(), чтобы
+отставание реплики не закрепилось в них.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Разрешает или запрещает чтение с реплик внутри блока."""
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def use_primary():
+    """Читает из default внутри блока или декорированной функции."""
+    return use_replicas(False)
+
+
+class ReplicaRouter:
+    """Направляет разрешённые чтения на случайную реплику."""
+
+    def db_for_read(self, model, **hints):
+        """Реплика, если чтение с реплик разрешено, иначе default.
+
+        default возвращается явно: иначе Django взял бы БД объекта
+        из подсказки instance, то есть реплику, с которой он прочитан.
+        """
+        if replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """Запись всегда идёт в default."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики содержат те же данные, что и default."""
+        return True
@@ -4,13 +4,16 @@ import os
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
-from .utils import debug_bool_check, get_allowed_hosts
+from .utils import (
+    debug_bool_check, get_allowed_hosts, get_bool_env, get_list_env)
 from .constants import PAGINATION_PAGE_SIZE, BASE_DIR
 
 load_dotenv()
 
 SECRET_KEY = os.getenv('SECRET_KEY', get_random_secret_key())
 
+SHORT_LINK_SECRET = os.getenv('SHORT_LINK_SECRET', SECRET_KEY)
+
 DEBUG = debug_bool_check()
 
 ALLOWED_HOSTS = get_allowed_hosts()
@@ -22,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'django_filters',
@@ -33,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.QueryTimingMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +48,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -62,14 +68,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '0'))
+DB_CONN_HEALTH_CHECKS = get_bool_env('DB_CONN_HEALTH_CHECKS', 'True')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.db',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # С пулом соединение возвращается в пул в конце каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE', '0' if DB_POOL_MAX_SIZE else '60')),
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'POOL': {
+            'max_size': DB_POOL_MAX_SIZE,
+            'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '5')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+            'check': DB_CONN_HEALTH_CHECKS,
+        } if DB_POOL_MAX_SIZE else None,
+        'PGBOUNCER_TRANSACTION_MODE': get_bool_env(
+            'DB_PGBOUNCER_TRANSACTION_MODE'),
+    }
+}
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(get_list_env('DB_REPLICA_HOSTS'), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -114,13 +153,22 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': (
         'rest_framework.pagination.LimitOffsetPagination'),
     'PAGE_SIZE': PAGINATION_PAGE_SIZE,
     'DEFAULT_FILTER_BACKENDS': [
-        'django_filters.rest_framework.DjangoFilterBackend']
+        'django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 AUTHENTICATION_BACKENDS = [
@@ -140,4 +188,26 @@ DJOSER = {
     },
 }
 
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_TIMING_SAMPLE_RATE', '1.0'))
+REQUEST_TIMING_N_PLUS_ONE_THRESHOLD = int(
+    os.getenv('REQUEST_TIMING_N_PLUS_ONE_THRESHOLD', '10'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 CSRF_TRUSTED_ORIGINS = ['https://aldmal.zapto.org']
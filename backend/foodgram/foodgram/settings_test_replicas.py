@@ -0,0 +1,20 @@
+"""Настройки для тестов чтения с реплик: default и replica в SQLite.
+
+python manage.py test --settings=foodgram.settings_test_replicas
+"""
+from .settings import *  # noqa: F401, F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
+
+# Тесты включают реплику через override_settings(DATABASE_REPLICAS=...).
+DATABASE_REPLICAS = []
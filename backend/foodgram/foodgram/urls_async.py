@@ -0,0 +1,31 @@
+"""Эндпоинты foodgram для ASGI.
+
+GET и HEAD публичного API обслуживают асинхронные представления
+(api.async_views), остальные методы (запись, OPTIONS) и эндпоинты —
+те же синхронные представления, что и в foodgram.urls.
+"""
+from django.urls import path
+
+from api import async_views
+from api.async_views import read_or_write
+from api.urls import router
+from .urls import urlpatterns as sync_urlpatterns
+
+sync_views = {url.name: url.callback for url in router.urls}
+
+urlpatterns = [
+    path('api/recipes/', read_or_write(
+        async_views.recipe_list, sync_views['recipe-list'])),
+    path('api/recipes/<int:pk>/', read_or_write(
+        async_views.recipe_detail, sync_views['recipe-detail'])),
+    path('api/tags/', read_or_write(
+        async_views.tag_list, sync_views['tag-list'])),
+    path('api/tags/<int:pk>/', read_or_write(
+        async_views.tag_detail, sync_views['tag-detail'])),
+    path('api/ingredients/', read_or_write(
+        async_views.ingredient_list, sync_views['ingredient-list'])),
+    path('api/ingredients/<int:pk>/', read_or_write(
+        async_views.ingredient_detail, sync_views['ingredient-detail'])),
+    path('s/<str:short_link>', async_views.redirect_short_link),
+    *sync_urlpatterns,
+]
@@ -11,7 +11,42 @@ def debug_bool_check():
     return debug.lower() == 'true'
 
 
+def get_bool_env(name, default='False'):
+    """Возврашает из .env логическое значение переменной name."""
+    return os.getenv(name, default).lower() == 'true'
+
+
+def get_list_env(name, default=''):
+    """Возврашает из .env список значений переменной name через запятую."""
+    return [
+        value.strip() for value in os.getenv(name, default).split(',')
+        if value.strip()]
+
+
 def get_allowed_hosts():
     """Возврашает из .env список хостов из ALLOWED_HOSTS."""
     allowed_hosts = os.getenv('ALLOWED_HOSTS', 'localhost, 127.0.0.1')
     return [host.strip() for host in allowed_hosts.split(',')]
+
+
+class PreserveCountersMixin:
+    """Не даёт полному save() перезаписать денормализованные счётчики.
+
+    Счётчики меняются только UPDATE с F(), поэтому при сохранении
+    загруженного ранее объекта они исключаются из update_fields,
+    иначе устаревшее значение затёрло бы параллельные изменения.
+    Отложенные (defer) поля тоже не сохраняются, как и в обычном save().
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        """Сохраняет все поля существующего объекта, кроме счётчиков."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred]
+        super().save(*args, **kwargs)
@@ -0,0 +1,42 @@
+"""Заполнение лент подписок."""
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api.feed import backfill
+from foodgram.constants import FEED_BACKFILL_BATCH_SIZE
+from users.models import Subscribe
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Рецепт раскладывается по лентам только при публикации, а при
+    подписке через API в ленту добавляются прошлые рецепты автора.
+    Подписки, созданные в обход API (bulk_create, админка, загрузка
+    данных), и рецепты, созданные через bulk_create, в ленты не
+    попадают: команда добавляет в ленты последние рецепты авторов
+    для всех подписок или для подписок начиная с даты --since.
+    """
+
+    help = 'Добавляет в ленты подписок последние рецепты авторов'
+
+    def add_arguments(self, parser):
+        """Добавляет дату начала и пользователей."""
+        parser.add_argument(
+            '--since', type=date.fromisoformat,
+            help='Дата подписки, ГГГГ-ММ-ДД')
+        parser.add_argument('--user', type=int, action='append')
+
+    def handle(self, *args, **options):
+        """Хэндлер заполнения лент."""
+        subscriptions = Subscribe.objects.order_by('user_id')
+        if options['since']:
+            subscriptions = subscriptions.filter(
+                created__gte=options['since'])
+        if options['user']:
+            subscriptions = subscriptions.filter(user_id__in=options['user'])
+        subscriptions = subscriptions.values_list('user_id', 'author_id')
+        backfill(subscriptions.iterator(chunk_size=FEED_BACKFILL_BATCH_SIZE))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {subscriptions.count()}'))
@@ -0,0 +1,241 @@
+"""Бенчмарк эндпоинтов api."""
+import base64
+import io
+import json
+import math
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.paginations import KeysetPagination
+from foodgram.constants import MAX_RECIPE_PER_PAGE
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+DEEP_PAGE = 1000
+
+
+def get_image():
+    """Возвращает картинку 1x1 в base64 для создания рецептов."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Выполняет сценарии в процессе через APIClient, без сети, на той БД,
+    что указана в настройках (SQLite или локальный PostgreSQL).
+    Для каждого сценария считает p50/p95 времени ответа и среднее
+    число запросов к БД и выводит результат в JSON.
+    """
+
+    help = 'Измеряет время ответа и число запросов к БД эндпоинтов api'
+
+    def add_arguments(self, parser):
+        """Добавляет параметры прогона."""
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument(
+            '--scenario', action='append', default=None,
+            help='Запустить только указанные сценарии')
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Предварительно сгенерировать данные (generate_data)')
+        parser.add_argument('--output', type=str, default=None)
+        parser.add_argument(
+            '--compare', type=str, default=None,
+            help='JSON предыдущего прогона для сравнения')
+
+    def get_scenarios(self):
+        """Возвращает словарь название: функция запроса."""
+        return {
+            'feed': lambda: self.client.get('/api/recipes/'),
+            'feed_anonymous': lambda: self.guest.get('/api/recipes/'),
+            'feed_filtered': lambda: self.client.get(
+                '/api/recipes/',
+                {'tags': self.tags, 'is_favorited': 1, 'limit': 12}),
+            'feed_page_1': lambda: self.client.get(
+                '/api/recipes/', {'page': 1}),
+            f'feed_page_{DEEP_PAGE}': lambda: self.client.get(
+                '/api/recipes/', {'page': self.deep_page}),
+            'feed_cursor_1': lambda: self.client.get(
+                '/api/recipes/', {'cursor': ''}),
+            f'feed_cursor_{DEEP_PAGE}': lambda: self.client.get(
+                '/api/recipes/', {'cursor': self.deep_cursor}),
+            'recipe_detail': lambda: self.client.get(
+                f'/api/recipes/{self.next_recipe()}/'),
+            'subscriptions': lambda: self.client.get(
+                '/api/users/subscriptions/', {'recipes_limit': 3}),
+            'subscription_feed': lambda: self.client.get(
+                '/api/recipes/feed/'),
+            'ingredient_search': lambda: self.client.get(
+                '/api/ingredients/', {'name': self.ingredient_prefix}),
+            'shopping_cart_download': self.download_shopping_cart,
+            'recipe_create': self.create_recipe,
+            'recipe_update': self.update_recipe,
+        }
+
+    def next_recipe(self):
+        """Перебирает рецепты по кругу."""
+        self.recipe_index = (self.recipe_index + 1) % len(self.recipes)
+        return self.recipes[self.recipe_index]
+
+    def recipe_payload(self, name):
+        """Возвращает тело запроса создания рецепта."""
+        return {
+            'name': name,
+            'text': 'Рецепт бенчмарка',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': self.tag_ids,
+            'ingredients': [
+                {'id': ingredient, 'amount': 10}
+                for ingredient in self.ingredients],
+        }
+
+    def download_shopping_cart(self):
+        """Скачивает корзину покупок целиком."""
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        b''.join(response.streaming_content)
+        return response
+
+    def create_recipe(self):
+        """Создаёт рецепт и запоминает его для удаления."""
+        response = self.client.post(
+            '/api/recipes/', self.recipe_payload('Новый рецепт'),
+            format='json')
+        if response.status_code == 201:
+            self.created.append(response.data['id'])
+        return response
+
+    def update_recipe(self):
+        """Обновляет название созданного пользователем рецепта."""
+        if not self.created:
+            self.create_recipe()
+        return self.client.patch(
+            f'/api/recipes/{self.created[0]}/',
+            self.recipe_payload(f'Обновлённый рецепт {time.time()}'),
+            format='json')
+
+    def prepare_deep_page(self):
+        """Находит номер и курсор страницы DEEP_PAGE ленты.
+
+        Если рецептов меньше, берётся последняя страница.
+        """
+        pages = math.ceil(Recipe.objects.count() / MAX_RECIPE_PER_PAGE)
+        self.deep_page = max(min(DEEP_PAGE, pages), 1)
+        if self.deep_page < DEEP_PAGE:
+            self.stderr.write(
+                f'Рецептов на {pages} стр., глубокая страница: '
+                f'{self.deep_page}')
+        self.deep_cursor = ''
+        if self.deep_page > 1:
+            paginator = KeysetPagination()
+            last = Recipe.objects.order_by(*paginator.ordering)[
+                (self.deep_page - 1) * MAX_RECIPE_PER_PAGE - 1]
+            self.deep_cursor = paginator.encode_cursor(last)
+
+    def prepare(self):
+        """Выбирает пользователя и данные для сценариев."""
+        user = User.objects.filter(
+            email__endswith='@benchmark.local',
+            follower__isnull=False).first()
+        if user is None or not Ingredient.objects.exists():
+            raise CommandError(
+                'Нет данных для бенчмарка, запустите с --generate '
+                'или выполните generate_data.')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.guest = APIClient()
+        self.recipes = list(
+            Recipe.objects.values_list('id', flat=True)[:200])
+        self.recipe_index = 0
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True)[:2])
+        self.tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        self.ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)[:8])
+        self.ingredient_prefix = Ingredient.objects.first().name[:2]
+        self.created = []
+        self.image = get_image()
+        self.prepare_deep_page()
+
+    def measure(self, request, repeat):
+        """Выполняет сценарий repeat раз и возвращает статистику."""
+        timings, queries = [], []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'Ответ {response.status_code}: {response.content!r}')
+            queries.append(len(captured))
+        percentiles = statistics.quantiles(timings, n=20, method='inclusive')
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentiles[18], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': round(statistics.fmean(queries), 2),
+            'repeat': repeat,
+        }
+
+    def compare(self, results, path):
+        """Печатает изменение p50 и числа запросов относительно прогона."""
+        with open(path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['scenarios']
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            self.stderr.write(
+                f'{name}: p50 {before["p50_ms"]} -> {result["p50_ms"]} мс '
+                f'({result["p50_ms"] / before["p50_ms"] - 1:+.0%}), '
+                f'запросов {before["queries"]} -> {result["queries"]}')
+
+    def handle(self, *args, **options):
+        """Хэндлер бенчмарка."""
+        if options['repeat'] < 2:
+            raise CommandError('--repeat должен быть не меньше 2')
+        if options['generate']:
+            call_command('generate_data', stdout=self.stderr)
+        scenarios = self.get_scenarios()
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(unknown)}')
+        self.prepare()
+        results = {}
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                for name in selected:
+                    results[name] = self.measure(
+                        scenarios[name], options['repeat'])
+                    self.stderr.write(f'{name}: {results[name]}')
+            finally:
+                Recipe.objects.filter(id__in=self.created).delete()
+        report = json.dumps({
+            'database': connection.vendor,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+        if options['compare']:
+            self.compare(results, options['compare'])
@@ -0,0 +1,62 @@
+"""Бенчмарк аутентификации по токену: БД против кэша."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Замеряет только authenticate() без представления и middleware,
+    то есть накладные расходы аутентификации на один запрос.
+    Для кэша отдельно замеряются попадания в словарь процесса
+    и в общий кэш.
+    """
+
+    help = ('Сравнивает время аутентификации по токену через '
+            'TokenAuthentication и CachedTokenAuthentication')
+
+    def add_arguments(self, parser):
+        """Добавляет число повторов."""
+        parser.add_argument('--repeat', type=int, default=1000)
+
+    def measure(self, authenticate, request, repeat, before=None):
+        """Возвращает среднее время в мкс и число запросов к БД."""
+        elapsed = 0.0
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                if before:
+                    before()
+                started = time.perf_counter()
+                authenticate(request)
+                elapsed += time.perf_counter() - started
+        return elapsed * 1e6 / repeat, len(queries) / repeat
+
+    def handle(self, *args, **options):
+        """Хэндлер бенчмарка."""
+        token = Token.objects.select_related('user').filter(
+            user__is_active=True).first()
+        if token is None:
+            raise CommandError(
+                'Нет токенов: войдите хотя бы одним пользователем.')
+        request = RequestFactory().get(
+            '/api/recipes/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        cached = CachedTokenAuthentication()
+        cached.authenticate(request)
+        for title, authenticate, before in (
+                ('db', TokenAuthentication().authenticate, None),
+                ('shared_cache', cached.authenticate,
+                 token_cache.clear_local),
+                ('local_cache', cached.authenticate, None)):
+            elapsed, queries = self.measure(
+                authenticate, request, options['repeat'], before)
+            self.stdout.write(
+                f'{title}: {elapsed:.1f} мкс/запрос, '
+                f'{queries:.1f} запросов к БД/запрос')
@@ -0,0 +1,147 @@
+"""Бенчмарк пропускной способности WSGI и ASGI при медленной БД."""
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe
+
+SCENARIOS = {
+    'feed': '/api/recipes/',
+    'recipe_detail': '/api/recipes/{recipe_id}/',
+    'tags': '/api/tags/',
+}
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Каждый запрос к БД задерживается на --latency мс (time.sleep
+    в обёртке execute), что имитирует удалённую или нагруженную БД.
+    Синхронный режим — WSGI-обработчик в --workers потоках, как
+    gunicorn с --workers синхронными воркерами. Асинхронный — один
+    ASGIHandler с эндпоинтами foodgram.urls_async, которому
+    одновременно отправляются --concurrency запросов, как uvicorn
+    воркеру. Запросы идут с токеном, чтобы не попадать в кэш ответов
+    для анонимов. Сравниваются запросы в секунду и задержки.
+    """
+
+    help = 'Сравнивает пропускную способность WSGI и ASGI'
+
+    def add_arguments(self, parser):
+        """Добавляет параметры нагрузки."""
+        parser.add_argument(
+            '--scenario', choices=tuple(SCENARIOS), default='recipe_detail')
+        parser.add_argument('--latency', type=float, default=20.0)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def add_latency(self, connection, **kwargs):
+        """Добавляет задержку ко всем запросам соединения."""
+        def delay(execute, sql, params, many, context):
+            time.sleep(self.latency)
+            return execute(sql, params, many, context)
+        connection.execute_wrappers.append(delay)
+
+    def run_sync(self, path, total, workers):
+        """Выполняет запросы через WSGI в пуле потоков."""
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(
+                    HTTP_AUTHORIZATION=f'Token {self.token}')
+            started = time.perf_counter()
+            status = local.client.get(path).status_code
+            return status, time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='foodgram.urls'), \
+                ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(request, range(total)))
+
+    def run_async(self, path, total, concurrency):
+        """Выполняет запросы через ASGIHandler в одном цикле событий."""
+        application = ASGIHandler()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token}'.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+
+        async def request(semaphore):
+            messages = [{'type': 'http.request', 'body': b''}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                started = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return status[0], time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(request(semaphore) for _ in range(total)))
+
+        with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+            return asyncio.run(main())
+
+    def report(self, title, results, elapsed):
+        """Печатает пропускную способность и задержки."""
+        if any(status != 200 for status, _ in results):
+            raise CommandError(f'{title}: есть ответы не 200.')
+        durations = sorted(duration * 1000 for _, duration in results)
+        self.stdout.write(
+            f'{title}: {len(results) / elapsed:.1f} запросов/с, '
+            f'p50 {statistics.median(durations):.1f} мс, '
+            f'p95 {durations[int(len(durations) * 0.95) - 1]:.1f} мс')
+
+    def handle(self, *args, **options):
+        """Хэндлер бенчмарка."""
+        recipe = Recipe.objects.only('id').first()
+        token = Token.objects.filter(user__is_active=True).first()
+        if recipe is None or token is None:
+            raise CommandError(
+                'Нужны рецепты и токен: выполните generate_data '
+                'и войдите хотя бы одним пользователем.')
+        self.token = token.key
+        path = SCENARIOS[options['scenario']].format(recipe_id=recipe.pk)
+        self.latency = options['latency'] / 1000
+        connection_created.connect(self.add_latency)
+        connections.close_all()
+        try:
+            with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for title, run, parallel in (
+                        (f'wsgi x{options["workers"]}', self.run_sync,
+                         options['workers']),
+                        (f'asgi x{options["concurrency"]}', self.run_async,
+                         options['concurrency'])):
+                    started = time.perf_counter()
+                    results = run(path, options['requests'], parallel)
+                    self.report(
+                        title, results, time.perf_counter() - started)
+        finally:
+            connection_created.disconnect(self.add_latency)
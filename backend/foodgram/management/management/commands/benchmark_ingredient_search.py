@@ -0,0 +1,57 @@
+"""Бенчмарк поиска ингредиентов: индекс в памяти против запроса к БД."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.filters import IngredientFilter
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Класс Command."""
+
+    help = ('Сравнивает время поиска ингредиентов по префиксу '
+            'через индекс в памяти и через IngredientFilter')
+
+    def add_arguments(self, parser):
+        """Добавляет число повторов и длину префиксов."""
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--prefix-length', type=int, default=2)
+
+    def measure(self, search, prefixes, repeat):
+        """Возвращает среднее время запроса в мс и число запросов к БД."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for prefix in prefixes:
+                    search(prefix)
+            elapsed = time.perf_counter() - started
+        total = repeat * len(prefixes)
+        return elapsed * 1000 / total, len(queries) / total
+
+    def handle(self, *args, **options):
+        """Хэндлер бенчмарка."""
+        prefixes = sorted({
+            name[:options['prefix_length']].lower()
+            for name in Ingredient.objects.values_list('name', flat=True)})
+        if not prefixes:
+            self.stderr.write('Справочник ингредиентов пуст.')
+            return
+        ingredient_index.ensure_built()
+
+        def orm_search(prefix):
+            return list(IngredientFilter(
+                {'name': prefix}, queryset=Ingredient.objects.all()
+            ).qs.values('id', 'name', 'measurement_unit'))
+
+        for title, search in (('orm', orm_search),
+                              ('index', ingredient_index.search)):
+            elapsed, queries = self.measure(
+                search, prefixes, options['repeat'])
+            self.stdout.write(
+                f'{title}: {elapsed:.3f} мс/запрос, '
+                f'{queries:.1f} запросов к БД/запрос '
+                f'({len(prefixes)} префиксов x {options["repeat"]})')
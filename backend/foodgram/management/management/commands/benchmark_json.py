@@ -0,0 +1,78 @@
+"""Бенчмарк рендереров и парсеров JSON."""
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import IngredientSerializer, ReadRecipeSerializer
+from api.views import get_recipe_queryset
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Данные страницы ленты и полного списка ингредиентов сериализуются
+    один раз, затем замеряется только рендеринг в JSON и разбор
+    полученных байтов: JSONRenderer и JSONParser DRF против
+    FastJSONRenderer и FastJSONParser.
+    """
+
+    help = 'Сравнивает скорость рендеринга и разбора JSON'
+
+    def add_arguments(self, parser):
+        """Добавляет размер страницы ленты и число повторов."""
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def get_payloads(self, limit):
+        """Данные ответов ленты и списка ингредиентов."""
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = User.objects.filter(is_active=True).first()
+        if request.user is None or not Recipe.objects.exists():
+            raise CommandError(
+                'Нужны пользователи и рецепты: выполните generate_data.')
+        recipes = get_recipe_queryset(
+            Recipe.objects.all(), request.user)[:limit]
+        return {
+            'feed': ReadRecipeSerializer(
+                recipes, many=True, context={'request': request}).data,
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True).data,
+        }
+
+    def measure(self, function, argument, repeat):
+        """Возвращает результат и среднее время вызова в секундах."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = function(argument)
+        return result, (time.perf_counter() - started) / repeat
+
+    def handle(self, *args, **options):
+        """Хэндлер бенчмарка."""
+        if orjson is None:
+            self.stderr.write(
+                'orjson не установлен, FastJSONRenderer использует json.')
+        repeat = options['repeat']
+        for name, data in self.get_payloads(options['limit']).items():
+            for title, renderer, parser in (
+                    ('json', JSONRenderer(), JSONParser()),
+                    ('fast', FastJSONRenderer(), FastJSONParser())):
+                content, rendered = self.measure(
+                    renderer.render, data, repeat)
+                _, parsed = self.measure(
+                    lambda content: parser.parse(io.BytesIO(content)),
+                    content, repeat)
+                megabytes = len(content) / 2 ** 20
+                self.stdout.write(
+                    f'{name} {title}: {len(content)} байт, '
+                    f'рендеринг {rendered * 1000:.2f} мс '
+                    f'({megabytes / rendered:.1f} МБ/с), '
+                    f'разбор {parsed * 1000:.2f} мс '
+                    f'({megabytes / parsed:.1f} МБ/с)')
@@ -0,0 +1,85 @@
+"""Расчёт похожих рецептов."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from foodgram.constants import SIMILAR_CHUNK_SIZE, SIMILAR_RECIPES_TOP
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import METRICS, SimilarityMatrix, load_features
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Строит разреженную матрицу рецепт x признак (recipes.similarity),
+    находит для рецептов top самых похожих и сохраняет их в
+    SimilarRecipe частями по chunk-size рецептов. С --incremental
+    пересчитываются только рецепты, изменённые после прошлого расчёта,
+    и рецепты, в чьих списках они были или могут появиться.
+    """
+
+    help = 'Рассчитывает похожие рецепты по ингредиентам и тегам'
+
+    def add_arguments(self, parser):
+        """Добавляет параметры расчёта."""
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument(
+            '--metric', choices=tuple(METRICS), default='cosine')
+        parser.add_argument('--top', type=int, default=SIMILAR_RECIPES_TOP)
+        parser.add_argument(
+            '--chunk-size', type=int, default=SIMILAR_CHUNK_SIZE)
+
+    def get_affected(self, matrix, changed, top):
+        """Рецепты, чьи списки могли измениться из-за changed."""
+        affected = set(changed) | set(SimilarRecipe.objects.filter(
+            similar_id__in=changed).values_list('recipe_id', flat=True))
+        thresholds = {
+            recipe_id: worst if size >= top else -1
+            for recipe_id, worst, size in SimilarRecipe.objects.values(
+                'recipe_id').annotate(
+                    worst=Min('score'), size=Count('id')).values_list(
+                        'recipe_id', 'worst', 'size')}
+        for recipe_id in changed:
+            affected.update(
+                similar_id
+                for score, similar_id in matrix.scores(recipe_id)
+                if score > thresholds.get(similar_id, -1))
+        return affected
+
+    def handle(self, *args, **options):
+        """Хэндлер расчёта."""
+        started = time.perf_counter()
+        built_at = timezone.now()
+        since = None
+        if options['incremental']:
+            since = SimilarRecipe.objects.aggregate(
+                since=Max('built_at'))['since']
+        matrix = SimilarityMatrix(load_features(), options['metric'])
+        top = options['top']
+        if since is None:
+            recipe_ids = Recipe.objects.values_list('id', flat=True)
+        else:
+            recipe_ids = self.get_affected(
+                matrix,
+                Recipe.objects.filter(modified__gt=since).values_list(
+                    'id', flat=True),
+                top)
+        recipe_ids = sorted(recipe_ids)
+        saved = 0
+        for start in range(0, len(recipe_ids), options['chunk_size']):
+            chunk = recipe_ids[start:start + options['chunk_size']]
+            rows = [
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score, built_at=built_at)
+                for recipe_id in chunk
+                for score, similar_id in matrix.neighbours(recipe_id, top)]
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+                SimilarRecipe.objects.bulk_create(rows)
+            saved += len(rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {len(recipe_ids)}, '
+            f'связей: {saved} за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,19 @@
+"""Команда для просмотра статистики кэша рецептов."""
+from django.core.management.base import BaseCommand
+
+from api.cache import get_cache_stats
+
+
+class Command(BaseCommand):
+    """Класс Command."""
+
+    help = 'Выводит число попаданий и промахов кэша рецептов'
+
+    def handle(self, *args, **options):
+        """Хэндлер для вывода статистики."""
+        stats = get_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, '
+            f'hit ratio: {ratio:.1%}')
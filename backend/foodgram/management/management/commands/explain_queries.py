@@ -0,0 +1,113 @@
+"""Планы выполнения основных запросов api."""
+import re
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from api.filters import RecipeFilter
+from api.views import RecipeViewSet
+from foodgram.constants import MAX_RECIPE_PER_PAGE
+from recipes.models import Ingredient, IngredientInRecipe, Tag
+from users.models import User
+
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    В PostgreSQL выполняет EXPLAIN ANALYZE, в остальных БД EXPLAIN.
+    Планы с Seq Scan по таблицам из SEQ_SCAN_TABLES помечаются,
+    чтобы регрессии индексов были видны сразу.
+    """
+
+    help = 'Выводит планы выполнения канонических запросов api'
+
+    SEQ_SCAN_TABLES = (
+        'recipes_recipe',
+        'recipes_favorite',
+        'recipes_shoppingcart',
+        'recipes_ingredientinrecipe',
+        'users_subscribe',
+    )
+
+    def add_arguments(self, parser):
+        """Добавляет email пользователя, от имени которого строить запросы."""
+        parser.add_argument('--user', type=str, default=None)
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы целиком')
+
+    def get_user(self, email):
+        """Возвращает пользователя из параметра или последнего созданного."""
+        if email:
+            return User.objects.get(email=email)
+        return User.objects.order_by('-id').first() or AnonymousUser()
+
+    def get_recipes(self, user, data):
+        """Собирает кверисет ленты так же, как RecipeViewSet."""
+        view = RecipeViewSet()
+        view.request = SimpleNamespace(user=user)
+        return RecipeFilter(
+            data, queryset=view.get_queryset(), request=view.request
+        ).qs[:MAX_RECIPE_PER_PAGE]
+
+    def get_queries(self, user):
+        """Возвращает словарь название: кверисет."""
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        queries = {
+            'feed': self.get_recipes(user, {}),
+            'feed_by_author': self.get_recipes(
+                user, {'author': getattr(user, 'pk', None)}),
+            'feed_by_tag': self.get_recipes(
+                user, {'tags': [tag.slug] if tag else []}),
+            'feed_search': self.get_recipes(user, {'search': 'суп'}),
+            'feed_search_trigram': self.get_recipes(
+                user, {'search': 'суп', 'search_mode': 'trigram'}),
+            'ingredient_search': Ingredient.objects.filter(
+                name__istartswith=ingredient.name[:2] if ingredient else ''),
+        }
+        if user.is_authenticated:
+            queries.update({
+                'feed_favorited': self.get_recipes(
+                    user, {'is_favorited': '1'}),
+                'feed_in_shopping_cart': self.get_recipes(
+                    user, {'is_in_shopping_cart': '1'}),
+                'subscriptions': User.objects.filter(
+                    subscribed_author__user=user),
+                'shopping_cart_download': IngredientInRecipe.objects.filter(
+                    recipe__shopping_cart__user=user
+                ).values(
+                    'ingredient__name', 'ingredient__measurement_unit'
+                ).annotate(amount=Sum('amount')).order_by(
+                    'ingredient__name'),
+            })
+        return queries
+
+    def handle(self, *args, **options):
+        """Хэндлер команды."""
+        user = self.get_user(options['user'])
+        explain_options = (
+            {'analyze': True, 'buffers': True}
+            if connection.vendor == 'postgresql' else {})
+        for name, queryset in self.get_queries(user).items():
+            plan = queryset.explain(**explain_options)
+            execution_time = EXECUTION_TIME.search(plan)
+            seq_scans = [
+                table for table in self.SEQ_SCAN_TABLES
+                if re.search(
+                    rf'Seq Scan on {table}\b|SCAN {table}\b(?! USING)', plan)]
+            summary = name
+            if execution_time:
+                summary += f': {execution_time.group(1)} мс'
+            if seq_scans:
+                self.stdout.write(self.style.WARNING(
+                    f'{summary}, полный просмотр: {", ".join(seq_scans)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(summary))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
@@ -0,0 +1,117 @@
+"""Генерация тестовых данных для бенчмарков."""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import invalidate_recipes
+from api.pantry import invalidate_pantry
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag)
+from users.models import Subscribe, User
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Создаёт пользователей, рецепты, избранное, корзины и подписки
+    пачками через bulk_create. Генерация детерминирована параметром
+    --seed, поэтому прогоны бенчмарка на разных ветках сравнимы.
+    """
+
+    help = 'Заполняет БД пользователями, рецептами, избранным и подписками'
+
+    def add_arguments(self, parser):
+        """Добавляет параметры объёма данных."""
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--prefix', type=str, default='bench')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def sample(self, population, size):
+        """Возвращает до size случайных элементов без повторов."""
+        return self.random.sample(population, min(size, len(population)))
+
+    def get_reference_data(self):
+        """Возвращает id тегов и ингредиентов, создавая их при отсутствии."""
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=f'Тег {i}', slug=f'tag{i}') for i in range(4))
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+                for i in range(500))
+        return (list(Tag.objects.values_list('id', flat=True)),
+                list(Ingredient.objects.values_list('id', flat=True)))
+
+    def create_users(self, prefix, count):
+        """Создаёт пользователей с общим паролем."""
+        password = make_password(BENCHMARK_PASSWORD)
+        User.objects.bulk_create(
+            (User(email=f'{prefix}{i}@benchmark.local',
+                  username=f'{prefix}{i}',
+                  first_name='Бенчмарк', last_name=str(i),
+                  password=password)
+             for i in range(count)),
+            ignore_conflicts=True)
+        return list(User.objects.filter(
+            email__endswith='@benchmark.local',
+            username__startswith=prefix).values_list('id', flat=True))
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        """Хэндлер генерации."""
+        self.random = random.Random(options['seed'])
+        tags, ingredients = self.get_reference_data()
+        users = self.create_users(options['prefix'], options['users'])
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author_id=self.random.choice(users),
+                   name=f'Рецепт {options["prefix"]} {i}',
+                   text='Сгенерировано для бенчмарка',
+                   cooking_time=self.random.randint(1, 120))
+            for i in range(options['recipes']))
+        recipe_ids = [recipe.id for recipe in recipes]
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.sample(tags, 2))
+        IngredientInRecipe.objects.bulk_create(
+            (IngredientInRecipe(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient_id in self.sample(
+                 ingredients, options['ingredients_per_recipe'])),
+            batch_size=5000)
+        for model, per_user in ((Favorite, 'favorites_per_user'),
+                                (ShoppingCart, 'carts_per_user')):
+            model.objects.bulk_create(
+                (model(user_id=user_id, recipe_id=recipe_id)
+                 for user_id in users
+                 for recipe_id in self.sample(recipe_ids, options[per_user])),
+                batch_size=5000, ignore_conflicts=True)
+        Subscribe.objects.bulk_create(
+            (Subscribe(user_id=user_id, author_id=author_id)
+             for user_id in users
+             for author_id in self.sample(
+                 users, options['subscriptions_per_user'])
+             if author_id != user_id),
+            batch_size=5000, ignore_conflicts=True)
+        call_command('recount_counters', stdout=self.stdout)
+        transaction.on_commit(invalidate_recipes)
+        transaction.on_commit(invalidate_pantry)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} польз., {len(recipe_ids)} рецептов'))
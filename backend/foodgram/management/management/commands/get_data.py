@@ -1,28 +1,167 @@
 """Приложение для загрузки данных в бд."""
 import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.search import invalidate_ingredients
+from foodgram.constants import DATA_LOAD_BATCH_SIZE
+
+NATURAL_KEYS = {
+    'ingredient': ('name', 'measurement_unit'),
+    'tag': ('slug',),
+}
+
+
+def read_rows(path):
+    """Читает строки csv или json файла как словари."""
+    with open(path, 'r', encoding='utf-8') as datafile:
+        if path.suffix == '.json':
+            yield from json.load(datafile)
+        else:
+            yield from csv.DictReader(datafile, delimiter=',')
+
+
+def batched(rows, size):
+    """Разбивает поток строк на списки по size элементов."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
 
 
 class Command(BaseCommand):
-    """Класс Command."""
+    """Класс Command.
 
-    help = 'Название модели должно полностью совпадать с названием файла csv'
+    Загружает строки пачками и обновляет существующие записи по
+    натуральному ключу (name + measurement_unit для ингредиентов,
+    slug для тегов), поэтому повторный запуск на том же файле
+    ничего не пишет в БД. В PostgreSQL по умолчанию используется COPY.
+    """
+
+    help = ('Название модели должно совпадать с названием файла csv '
+            'или json (допускается множественное число)')
 
     def add_arguments(self, parser):
-        """Добавляет csv файл как аргумент."""
+        """Добавляет файл данных как аргумент и параметры загрузки."""
         parser.add_argument('path', type=str)
+        parser.add_argument(
+            '--batch-size', type=int, default=DATA_LOAD_BATCH_SIZE)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже в PostgreSQL')
+
+    def get_model(self, path):
+        """Находит модель по имени файла."""
+        name = path.stem.lower()
+        for model in apps.get_models():
+            if name in (model._meta.model_name,
+                        f'{model._meta.model_name}s'):
+                return model
+        raise CommandError(f'Не найдена модель для файла {path.name}')
+
+    def report(self, loaded, started):
+        """Печатает число загруженных строк и скорость загрузки."""
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{loaded} строк, {loaded / max(elapsed, 1e-9):.0f} строк/с')
 
     def handle(self, *args, **options):
         """Хэндлер для заполнения БД."""
-        models = apps.get_models()
-        name = options['path'].split('/')[-1].split('.')[0]
-        for model in models:
-            if name == model.__name__.lower():
-                with open(options['path'], 'r', encoding='utf-8') as csvfile:
-                    rows = list(csv.reader(csvfile, delimiter=','))
-                    for row in rows[1:]:
-                        db = dict(zip(rows[0], row))
-                        model.objects.create(**db)
-                break
+        path = Path(options['path'])
+        model = self.get_model(path)
+        key = NATURAL_KEYS.get(model._meta.model_name)
+        use_copy = (
+            key is not None
+            and path.suffix != '.json'
+            and connection.vendor == 'postgresql'
+            and not options['no_copy'])
+        started = time.perf_counter()
+        loaded = 0
+        for batch in batched(read_rows(path), options['batch_size']):
+            with transaction.atomic():
+                if use_copy:
+                    self.copy_batch(model, key, batch)
+                else:
+                    self.upsert_batch(model, key, batch)
+            loaded += len(batch)
+            self.report(loaded, started)
+        if model._meta.model_name == 'ingredient':
+            transaction.on_commit(invalidate_ingredients)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка {path.name} в {model.__name__} завершена'))
+
+    def upsert_batch(self, model, key, batch):
+        """Добавляет новые и обновляет изменённые строки пачки.
+
+        Существующие записи пачки выбираются одним запросом по
+        натуральному ключу, так что неизменённые строки не пишутся.
+        """
+        if key is None:
+            model.objects.bulk_create(
+                [model(**row) for row in batch], ignore_conflicts=True)
+            return
+        rows = {tuple(row[field] for field in key): row for row in batch}
+        lookup = {f'{key[0]}__in': {values[0] for values in rows}}
+        existing = {
+            tuple(getattr(obj, field) for field in key): obj
+            for obj in model.objects.filter(**lookup)}
+        changed_fields = set()
+        changed = []
+        for values, row in rows.items():
+            obj = existing.get(values)
+            if obj is None:
+                continue
+            fields = [
+                field for field, value in row.items()
+                if getattr(obj, field)
+                != model._meta.get_field(field).to_python(value)]
+            for field in fields:
+                setattr(obj, field, row[field])
+            if fields:
+                changed_fields.update(fields)
+                changed.append(obj)
+        model.objects.bulk_create(
+            [model(**row) for values, row in rows.items()
+             if values not in existing],
+            ignore_conflicts=True)
+        if changed:
+            model.objects.bulk_update(changed, sorted(changed_fields))
+
+    def copy_batch(self, model, key, batch):
+        """Загружает пачку через COPY во временную таблицу и upsert."""
+        table = connection.ops.quote_name(model._meta.db_table)
+        fields = list(batch[0])
+        columns = ', '.join(map(connection.ops.quote_name, fields))
+        conflict = ', '.join(map(connection.ops.quote_name, key))
+        updates = [field for field in fields if field not in key]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [row[field] for field in fields] for row in batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE get_data_batch ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA')
+            cursor.copy_expert(
+                f'COPY get_data_batch ({columns}) FROM STDIN WITH CSV',
+                buffer)
+            if updates:
+                assignments = ', '.join(
+                    f'{column} = EXCLUDED.{column}' for column in map(
+                        connection.ops.quote_name, updates))
+                changed = ' OR '.join(
+                    f'{table}.{column} IS DISTINCT FROM EXCLUDED.{column}'
+                    for column in map(connection.ops.quote_name, updates))
+                on_conflict = f'DO UPDATE SET {assignments} WHERE {changed}'
+            else:
+                on_conflict = 'DO NOTHING'
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({conflict}) {columns} '
+                f'FROM get_data_batch ON CONFLICT ({conflict}) {on_conflict}')
@@ -0,0 +1,40 @@
+"""Пересчёт денормализованных счётчиков."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+
+def count_of(model, field):
+    """Подзапрос числа строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')), 0)
+
+
+class Command(BaseCommand):
+    """Класс Command.
+
+    Счётчики обновляются сигналами в той же транзакции, что и
+    изменение данных, но массовые операции (bulk_create, update,
+    raw SQL) сигналов не отправляют. Команда пересчитывает все
+    счётчики двумя UPDATE с коррелированными подзапросами.
+    """
+
+    help = ('Пересчитывает favorites_count, in_carts_count рецептов '
+            'и recipes_count, followers_count пользователей')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        """Хэндлер пересчёта."""
+        recipes = Recipe.objects.update(
+            favorites_count=count_of(Favorite, 'recipe'),
+            in_carts_count=count_of(ShoppingCart, 'recipe'))
+        users = User.objects.update(
+            recipes_count=count_of(Recipe, 'author'),
+            followers_count=count_of(Subscribe, 'author'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано: {recipes} рецептов, {users} польз.'))
@@ -1,5 +1,6 @@
 """Настройка админ зоны приложения recipes."""
 from django.contrib import admin
+from django.db.models import Q
 
 from .models import (
     Favorite,
@@ -9,6 +10,7 @@ from .models import (
     RecipeLinks,
     ShoppingCart,
     Tag)
+from .search import search_recipes
 
 
 class IngredientInRecipeInline(admin.StackedInline):
@@ -65,9 +67,19 @@ class RecipeAdmin(admin.ModelAdmin):
 
     def in_favorite(self, obj):
         """Возвращает число раз в избранном."""
-        return f'{obj.favorite.count()} польз.'
+        return f'{obj.favorites_count} польз.'
 
     in_favorite.short_description = 'В избранное добавили'
+    in_favorite.admin_order_field = 'favorites_count'
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу search_vector и по логину автора."""
+        if not search_term:
+            return queryset, False
+        found = search_recipes(Recipe.objects.all(), search_term)
+        return queryset.filter(
+            Q(pk__in=found.values('pk'))
+            | Q(author__username=search_term)), False
 
 
 @admin.register(Tag)
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:59
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет по одному ингредиенту на пару название + единица.
+
+    Если в рецепте есть несколько дубликатов одного ингредиента,
+    их количество складывается в одну строку, остальные удаляются.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        group = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        )
+        rows = IngredientInRecipe.objects.filter(ingredient__in=group)
+        merged = rows.order_by().values('recipe').annotate(
+            row_id=Min('id'), amount=Sum('amount'), total=Count('id')
+        ).filter(total__gt=1)
+        for row in merged:
+            rows.filter(recipe=row['recipe']).exclude(
+                id=row['row_id']).delete()
+            IngredientInRecipe.objects.filter(id=row['row_id']).update(
+                amount=min(row['amount'], MAX_AMOUNT))
+        rows.update(ingredient_id=duplicate['keep_id'])
+        group.exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_remove_recipelinks_original_link_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
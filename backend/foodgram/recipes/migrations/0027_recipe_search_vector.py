@@ -0,0 +1,60 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:19
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Вектор пересчитывается триггером при изменении name или text,
+# поэтому bulk_create и UPDATE в обход ORM тоже его обновляют.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({row}text, '')), 'B')")
+CREATE_SEARCH = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update() '
+    'RETURNS trigger AS $$ BEGIN '
+    f'NEW.search_vector := {SEARCH_VECTOR.format(row="NEW.")}; '
+    'RETURN NEW; END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()',
+    f'UPDATE recipes_recipe SET search_vector = {SEARCH_VECTOR.format(row="")}',
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS recipe_name_trgm_idx '
+    'ON recipes_recipe USING gin (name gin_trgm_ops)',
+)
+DROP_SEARCH = (
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()',
+)
+
+
+def run_on_postgresql(statements):
+    """Выполняет SQL только в PostgreSQL."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_SEARCH),
+            run_on_postgresql(DROP_SEARCH)),
+    ]
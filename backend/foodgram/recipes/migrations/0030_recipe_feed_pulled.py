@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+from foodgram.constants import FEED_FANOUT_MAX_FOLLOWERS
+
+
+def mark_pulled_recipes(apps, schema_editor):
+    """Отмечает рецепты авторов, которые не раскладывались по лентам."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(
+        author__followers_count__gte=FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0029_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Читается в ленты при запросе'),
+        ),
+        migrations.RunPython(
+            mark_pulled_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('feed_pulled', True)), fields=['author', '-pub_date'], name='recipe_feed_pulled_idx'),
+        ),
+    ]
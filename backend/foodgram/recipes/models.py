@@ -1,8 +1,10 @@
 """Модели приложения recipes."""
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.dispatch import receiver
-import shortuuid
 
 from foodgram.constants import (
     MIN_RECIPE_COOKING_TIME,
@@ -13,6 +15,7 @@ from foodgram.constants import (
     MAX_INGREDIENT_NAME_LENGHT,
     MAX_TAG_NAME_LENGHT,
     TAG_SLUG_REGEX)
+from foodgram.utils import PreserveCountersMixin
 from users.models import User
 
 
@@ -34,6 +37,10 @@ class Ingredient(models.Model):
 
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [models.UniqueConstraint(
+            fields=['name', 'measurement_unit'],
+            name='unique_ingredient'
+        )]
 
     def __str__(self):
         """Возвращает называние ингредиента и его ед. измерения."""
@@ -67,7 +74,15 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeManager(models.Manager):
+    """Менеджер рецептов: не загружает поисковый вектор."""
+
+    def get_queryset(self):
+        """Откладывает поле search_vector, оно нужно только в запросах."""
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(PreserveCountersMixin, models.Model):
     """Модель рецепта."""
 
     author = models.ForeignKey(
@@ -80,6 +95,11 @@ class Recipe(models.Model):
         'Дата публикации рецепта',
         auto_now_add=True
     )
+    modified = models.DateTimeField(
+        'Дата изменения рецепта',
+        auto_now=True,
+        db_index=True
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         verbose_name='Ингредиенты',
@@ -108,13 +128,48 @@ class Recipe(models.Model):
             MIN_RECIPE_COOKING_TIME, 'Не меньше 1 минуты!'),),
         default=MIN_RECIPE_COOKING_TIME
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    feed_pulled = models.BooleanField(
+        'Читается в ленты при запросе',
+        default=False,
+        editable=False
+    )
+    counter_fields = ('favorites_count', 'in_carts_count')
+
+    objects = RecipeManager()
 
     class Meta:
         """Recipe метакласс."""
 
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'],
+                condition=models.Q(feed_pulled=True),
+                name='recipe_feed_pulled_idx'),
+        ]
 
     def __str__(self):
         """Возвращает название рецепта."""
@@ -210,6 +265,10 @@ class IngredientInRecipe(models.Model):
 
         verbose_name = 'Ингредиенты в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
+        indexes = [models.Index(
+            fields=['recipe', 'ingredient', 'amount'],
+            name='ingredient_in_recipe_idx'
+        )]
 
     def __str__(self):
         """Вовзращает id рецпта и его название."""
@@ -240,12 +299,119 @@ class RecipeLinks(models.Model):
         """Взвращает короткую ссылку."""
         return self.short_link
 
-    @receiver(models.signals.post_save, sender=Recipe)
-    def get_short_link(sender, instance, created, **kwargs):
-        """Создаёт короткую ссылку при создании рецепта."""
-        if created:
-            RecipeLinks.objects.create(
-                short_link=shortuuid.ShortUUID().random(
-                    length=MAX_RECIPELINKS_SHORTLINK_LENGHT),
-                recipe_id=instance.id
-            )
+
+class SimilarRecipe(models.Model):
+    """Модель похожего рецепта.
+
+    Заполняется командой build_similar_recipes.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='similar_to'
+    )
+    score = models.FloatField('Сходство')
+    built_at = models.DateTimeField('Дата расчёта')
+
+    class Meta:
+        """SimilarRecipe метакласс."""
+
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'similar'],
+            name='unique_similar_recipe'
+        )]
+
+    def __str__(self):
+        """Возвращает названия рецептов."""
+        return f'"{self.similar}" похож на "{self.recipe}"'
+
+
+class Timeline(models.Model):
+    """Модель ленты подписок пользователя.
+
+    Заполняется при публикации рецепта для каждого подписчика автора
+    (api.feed), дата публикации копируется для сортировки по индексу.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='timeline'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='timeline'
+    )
+    pub_date = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        """Timeline метакласс."""
+
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_timeline_recipe'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-recipe'],
+            name='timeline_user_pub_date_idx'
+        )]
+
+    def __str__(self):
+        """Возвращает название рецепта и юзернейм юзера."""
+        return f'"{self.recipe}" в ленте у {self.user}'
+
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def change_counter(model, pk, field, delta):
+    """Меняет счётчик одним UPDATE через F(), не опускаясь ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+@receiver(models.signals.post_save, sender=Favorite)
+@receiver(models.signals.post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    """Увеличивает счётчик избранного или корзин рецепта."""
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(models.signals.post_delete, sender=Favorite)
+@receiver(models.signals.post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """Уменьшает счётчик избранного или корзин рецепта."""
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(models.signals.post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(models.signals.post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    """Уменьшает счётчик рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
@@ -0,0 +1,40 @@
+"""Поиск рецептов по названию и описанию.
+
+В PostgreSQL используется столбец search_vector: его заполняет
+триггер (название с весом A, описание с весом B, конфигурация
+russian), а GIN индекс ускоряет @@. Режим trigram ищет по названию
+с опечатками через pg_trgm и GIN индекс recipe_name_trgm_idx.
+В остальных БД (SQLite в тестах) оба режима сводятся к поиску
+подстроки через iregex (LIKE в SQLite не различает регистр кириллицы),
+а совпадения в названии ставятся выше совпадений в описании.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramWordSimilarity)
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+SEARCH_CONFIG = 'russian'
+
+
+def search_recipes(queryset, value, mode='fts'):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    ordering = ('-rank', *queryset.model._meta.ordering)
+    if connections[queryset.db].vendor != 'postgresql':
+        pattern = re.escape(value)
+        return queryset.filter(
+            Q(name__iregex=pattern) | Q(text__iregex=pattern)
+        ).annotate(rank=Case(
+            When(name__iregex=pattern, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField())
+        ).order_by(*ordering)
+    if mode == 'trigram':
+        return queryset.filter(name__trigram_word_similar=value).annotate(
+            rank=TrigramWordSimilarity(value, 'name')
+        ).order_by(*ordering)
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by(*ordering)
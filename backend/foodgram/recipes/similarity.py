@@ -0,0 +1,95 @@
+"""Сходство рецептов по общим ингредиентам и тегам.
+
+Рецепт — бинарный вектор признаков: ингредиенты и теги. Разреженная
+матрица рецепт x признак хранится двумя словарями массивов: признаки
+рецепта и рецепты признака. Пересечения рецепта со всеми остальными
+считаются сложением массивов его признаков в Counter, а оценки
+собираются через map без вызовов функций Python на каждую пару.
+
+Признаки, которые есть больше чем у SIMILAR_MAX_FREQUENCY доли
+рецептов (соль, вода), почти не отличают рецепты друг от друга,
+но дают основную часть пересечений, поэтому в матрицу не попадают.
+"""
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import repeat
+from math import sqrt
+from operator import add, mul, sub, truediv
+
+from foodgram.constants import (
+    SIMILAR_MAX_FREQUENCY, SIMILAR_MIN_FREQUENCY_LIMIT)
+from .models import IngredientInRecipe, Recipe
+
+
+def cosine(overlaps, size, sizes):
+    """Косинусное сходство бинарных векторов."""
+    return map(truediv, overlaps, map(sqrt, map(mul, repeat(size), sizes)))
+
+
+def jaccard(overlaps, size, sizes):
+    """Коэффициент Жаккара множеств признаков."""
+    overlaps = list(overlaps)
+    return map(truediv, overlaps,
+               map(sub, map(add, repeat(size), sizes), overlaps))
+
+
+METRICS = {'cosine': cosine, 'jaccard': jaccard}
+
+
+def load_features():
+    """Возвращает признаки рецептов: id ингредиентов и тегов.
+
+    Id ингредиентов и тегов разводятся по чётности, чтобы признаки
+    помещались в один массив целых чисел.
+    """
+    features = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        features[recipe_id].add(ingredient_id * 2)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id').iterator():
+        features[recipe_id].add(tag_id * 2 + 1)
+    return features
+
+
+class SimilarityMatrix:
+    """Разреженная матрица рецепт x признак."""
+
+    def __init__(self, features, metric='cosine'):
+        """Строит матрицу, отбрасывая слишком частые признаки."""
+        frequency = Counter(
+            feature for row in features.values() for feature in row)
+        limit = max(SIMILAR_MAX_FREQUENCY * len(features),
+                    SIMILAR_MIN_FREQUENCY_LIMIT)
+        self.metric = METRICS[metric]
+        self._rows = {}
+        self._postings = defaultdict(partial(array, 'I'))
+        for recipe_id in sorted(features):
+            row = array('I', sorted(
+                feature for feature in features[recipe_id]
+                if frequency[feature] <= limit))
+            if not row:
+                continue
+            self._rows[recipe_id] = row
+            for feature in row:
+                self._postings[feature].append(recipe_id)
+
+    def scores(self, recipe_id):
+        """Возвращает пары (сходство, id) со всеми пересекающимися."""
+        row = self._rows.get(recipe_id)
+        if row is None:
+            return iter(())
+        overlaps = Counter()
+        for feature in row:
+            overlaps.update(self._postings[feature])
+        del overlaps[recipe_id]
+        return zip(
+            self.metric(overlaps.values(), len(row), map(len, map(
+                self._rows.__getitem__, overlaps.keys()))),
+            overlaps.keys())
+
+    def neighbours(self, recipe_id, top):
+        """Возвращает top самых похожих рецептов, новые выше при равенстве."""
+        return heapq.nlargest(top, self.scores(recipe_id))
@@ -39,7 +39,8 @@ class UserAdmin(admin.ModelAdmin):
         SubscribedAuthorInline
     )
 
-    list_display = ('id', 'username', 'email', 'first_name')
+    list_display = ('id', 'username', 'email', 'first_name',
+                    'recipes_count', 'followers_count')
     list_display_links = ('username',)
     search_fields = ('first_name', 'email',)
 
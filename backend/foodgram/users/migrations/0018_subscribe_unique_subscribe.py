@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_subscriptions(apps, schema_editor):
+    """Оставляет по одной подписке на пару user + author.
+
+    Раньше подписка создавалась после проверки exists(), и параллельные
+    запросы могли создать дубли. Счётчики пересчитывает recipes.0025.
+    """
+    Subscribe = apps.get_model('users', 'Subscribe')
+    duplicates = Subscribe.objects.order_by().values(
+        'user', 'author'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        Subscribe.objects.filter(
+            user=duplicate['user'], author=duplicate['author'],
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_alter_user_email_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'ordering': ('id', 'username'), 'verbose_name': 'Пользователь', 'verbose_name_plural': 'Пользователи'},
+        ),
+        migrations.RunPython(
+            delete_duplicate_subscriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscribe',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_subscribe'),
+        ),
+    ]
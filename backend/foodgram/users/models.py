@@ -1,11 +1,15 @@
 """Модели приложения users."""
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
 
 from foodgram.constants import MAX_USER_EMAIL_LENGTH, MAX_USER_NAME_LENGTH
+from foodgram.utils import PreserveCountersMixin
 
 
-class User(AbstractUser):
+class User(PreserveCountersMixin, AbstractUser):
     """Модель пользователя."""
 
     email = models.EmailField(
@@ -32,6 +36,17 @@ class User(AbstractUser):
         null=True,
         default=None
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False
+    )
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
@@ -79,3 +94,18 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'Пользователь {self.user} подписан на автора {self.author}'
+
+
+@receiver(models.signals.post_save, sender=Subscribe)
+def increment_followers_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик подписчиков автора."""
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F('followers_count') + 1)
+
+
+@receiver(models.signals.post_delete, sender=Subscribe)
+def decrement_followers_count(sender, instance, **kwargs):
+    """Уменьшает счётчик подписчиков автора."""
+    User.objects.filter(pk=instance.author_id).update(
+        followers_count=Greatest(F('followers_count') - 1, 0))